@@ -0,0 +1,292 @@
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from bulk_upload import TEMPLATE_COLUMNS, submit_records, validate_upload
+from config import API_HOST, API_PORT, MASTER_POLL_SECONDS
+from duplicate_index import SubmittedKeyIndex
+from hierarchy import HIERARCHY_LEVELS, dtr_codes, dtr_msns, feeder_codes, search_master
+from master_reload import master_reloader
+from metrics import inc, render, timed
+from record_export import EXPORT_FORMATS, FILTER_COLUMNS, export_blocks, export_file_name
+from record_store import RecordStore, SheetSync
+from sequence import ApplicationNumberAllocator
+from sheets import RECORD_COLUMNS, open_sheet
+from timing import DATE_FORMAT
+
+logger = logging.getLogger(__name__)
+
+# ----------------- SUBMISSION API -----------------
+# A small async JSON API beside the portal, for field apps and scripts that
+# should not drive the Streamlit form. One process serves many concurrent
+# requests: lookups answer straight from the shared master indexes, and
+# submissions are checked with the bulk upload's rules (the form's rules,
+# column-wise) and then committed through the same path as the portal:
+# duplicate key claim, application number, local store, SheetSync.
+#
+#   python api.py --port 8600
+#
+#   GET  /api/hierarchy?region=..&circle=..   children of the given path
+#   GET  /api/dtr/{dtr_code}                  path and master MSNs of a DTR
+#   GET  /api/search?q=..                     MSN / DTR code / feeder code prefix
+#   POST /api/records                         one record object, or a list
+#   GET  /api/export?format=csv&region=..&from=DD-MM-YYYY&to=DD-MM-YYYY
+#   GET  /metrics
+#
+# A record carries the bulk template's columns as snake_case fields:
+# dtr_code, msn, ct_ratio, off_time, on_time, date, officer_name,
+# mobile_number. An MSN the master doesn't know for the DTR is stored as a
+# new serial (new_msn, no msn_auto), never as a correction of one of the
+# DTR's meters: only the form's explicit answer feeds the MSN overlay.
+#
+# /api/export streams the stored records (csv, xlsx or parquet) a chunk at
+# a time, so the Export page links here for files too large to hand to
+# Streamlit's download button, which holds the whole file in memory.
+LEVEL_PARAMS = ["region", "circle", "division", "substation", "feeder", "dtr"]
+RECORD_FIELDS = ["dtr_code", "msn", "ct_ratio", "off_time", "on_time", "date", "officer_name", "mobile_number"]
+MAX_RECORDS = 1000
+BATCH_RECORDS = 500
+
+
+def master():
+    return master_reloader(MASTER_POLL_SECONDS).current
+
+
+def error(status, message):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def records_frame(items):
+    # JSON records -> the bulk template's frame, everything as stripped text
+    return pd.DataFrame(
+        [["" if item.get(field) is None else str(item[field]).strip() for field in RECORD_FIELDS] for item in items],
+        columns=TEMPLATE_COLUMNS
+    )
+
+
+# ----------------- SUBMISSION BATCHER -----------------
+# Concurrent requests queue their records; one task takes whatever has
+# queued up meanwhile and, in a worker thread, validates it in one pass
+# and submits it as a single claim / numbering / store transaction, so the
+# cost per record falls as the load rises. SheetSync then appends the new
+# rows to the sheet in its own batches.
+class SubmissionBatcher:
+    def __init__(self, store, allocator, submitted_keys, sheet_sync, max_records=BATCH_RECORDS):
+        self.store = store
+        self.allocator = allocator
+        self.submitted_keys = submitted_keys
+        self.sheet_sync = sheet_sync
+        self.max_records = max_records
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, items):
+        # one request's JSON records -> one result dict per record
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((items, future))
+        return await future
+
+    def _submit(self, requests):
+        # all queued requests as one frame, the request number as a group
+        frame = records_frame([item for items in requests for item in items])
+        group = np.repeat(np.arange(len(requests)), [len(items) for items in requests])
+        records, report = validate_upload(frame, master()["partitions"].lookup(), within=group)
+        with timed("dtr_api_batch_seconds"):
+            fresh, _ = submit_records(records, self.allocator, self.submitted_keys, self.store)
+        self.sheet_sync.notify()
+        inc("dtr_api_batches_total")
+
+        stored = dict(zip(fresh.index, fresh[RECORD_COLUMNS].to_dict("records")))
+        results = [[] for _ in requests]
+        for row, (request, errors) in enumerate(zip(group, report["Errors"])):
+            if errors:
+                result = {"status": "invalid", "errors": errors.split("; ")}
+            elif row in stored:
+                record = stored[row]
+                result = {"status": "created", "application_number": record["application_number"], "record": record}
+            else:
+                result = {"status": "duplicate", "errors": ["already indexed for this date"]}
+            results[request].append(result)
+        return results
+
+    async def _run(self):
+        while True:
+            queued = [await self._queue.get()]
+            count = len(queued[0][0])
+            while count < self.max_records and not self._queue.empty():
+                queued.append(self._queue.get_nowait())
+                count += len(queued[-1][0])
+
+            try:
+                results = await asyncio.to_thread(self._submit, [items for items, _ in queued])
+            except Exception as e:
+                # logged once here; each waiting request answers with a 500
+                logger.exception("Submitting a batch of %d requests failed", len(queued))
+                results = [e] * len(queued)
+            for (_, future), result in zip(queued, results):
+                if future.done():
+                    continue  # the client went away
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+# ----------------- ROUTES -----------------
+async def hierarchy(request):
+    with timed("dtr_api_request_seconds", route="hierarchy"):
+        partitions = master()["partitions"]
+        path = []
+        for param in LEVEL_PARAMS:
+            value = request.query_params.get(param)
+            if not value:
+                break
+            path.append(value)
+        if len(path) < len(HIERARCHY_LEVELS):
+            return JSONResponse({
+                "level": HIERARCHY_LEVELS[len(path)],
+                "options": partitions.children(*path),
+            })
+        index = partitions.region(path[0])
+        if index is None:
+            return JSONResponse({"feeder_codes": [], "dtr_codes": []})
+        return JSONResponse({
+            "feeder_codes": feeder_codes(index, *path),
+            "dtr_codes": dtr_codes(index, *path),
+        })
+
+
+async def dtr(request):
+    with timed("dtr_api_request_seconds", route="dtr"):
+        partitions = master()["partitions"]
+        dtr_code = request.path_params["dtr_code"]
+        paths = partitions.lookup()["paths"]
+        if dtr_code not in paths.index:
+            return error(404, f"DTR code {dtr_code} not found in master")
+        path = paths.loc[dtr_code]
+        return JSONResponse({
+            **{param: path[level] for param, level in zip(LEVEL_PARAMS, HIERARCHY_LEVELS)},
+            "feeder_code": path["Feeder code"],
+            "dtr_code": dtr_code,
+            "msns": dtr_msns(partitions.region(path["Region"]), dtr_code),
+        })
+
+
+async def search(request):
+    with timed("dtr_api_request_seconds", route="search"):
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(int(request.query_params.get("limit", 20)), 100)
+        except ValueError:
+            return error(400, "limit must be a number")
+        return JSONResponse({"matches": search_master(master()["partitions"].search_index(), query, limit)})
+
+
+async def submit(request):
+    with timed("dtr_api_request_seconds", route="records"):
+        try:
+            payload = await request.json()
+        except ValueError:
+            return error(400, "Body must be JSON")
+        single = isinstance(payload, dict)
+        items = [payload] if single else payload
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return error(400, "Body must be a record object or a non-empty list of them")
+        if len(items) > MAX_RECORDS:
+            return error(413, f"At most {MAX_RECORDS} records per request")
+
+        try:
+            results = await request.app.state.batcher.submit(items)
+        except Exception:
+            inc("dtr_submission_failures_total", len(items), reason="error")
+            return error(500, "Records could not be stored, please try again")
+        created = sum(result["status"] == "created" for result in results)
+        inc("dtr_submissions_total", created, source="api")
+        if created < len(results):
+            inc("dtr_submission_failures_total", len(results) - created, reason="validation")
+        if single:
+            status = {"created": 201, "invalid": 422, "duplicate": 409}[results[0]["status"]]
+            return JSONResponse(results[0], status_code=status)
+        return JSONResponse({"results": results})
+
+
+async def export(request):
+    params = request.query_params
+    fmt = params.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return error(400, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    match = {column: params[column] for column in FILTER_COLUMNS if params.get(column)}
+    try:
+        date_from, date_to = [
+            datetime.strptime(params[name], DATE_FORMAT).date() if params.get(name) else None
+            for name in ("from", "to")
+        ]
+    except ValueError:
+        return error(400, "from and to must be DD-MM-YYYY")
+    return StreamingResponse(
+        export_blocks(request.app.state.store, fmt, match, date_from, date_to),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{export_file_name(fmt, match)}"'},
+    )
+
+
+async def metrics(request):
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(master_reloader, MASTER_POLL_SECONDS)
+    store = app.state.store = RecordStore()
+    submitted_keys = SubmittedKeyIndex()
+    sheet_sync = SheetSync(store, open_sheet=open_sheet, submitted_keys=submitted_keys).start()
+    app.state.batcher = SubmissionBatcher(
+        store, ApplicationNumberAllocator(), submitted_keys, sheet_sync
+    ).start()
+    try:
+        yield
+    finally:
+        await app.state.batcher.stop()
+        sheet_sync.stop(timeout=10)
+
+
+app = Starlette(
+    routes=[
+        Route("/api/hierarchy", hierarchy),
+        Route("/api/dtr/{dtr_code:path}", dtr),
+        Route("/api/search", search),
+        Route("/api/records", submit, methods=["POST"]),
+        Route("/api/export", export),
+        Route("/metrics", metrics),
+    ],
+    lifespan=lifespan,
+)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the DTR indexation JSON API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port)
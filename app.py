@@ -1,8 +1,25 @@
+import logging
+import time
+
 import streamlit as st
-import pandas as pd
 from datetime import datetime
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from master_reload import master_reloader
+from hierarchy import hierarchy_children, feeder_codes, dtr_codes, dtr_msns, search_master, path_id, path_values
+from sequence import ApplicationNumberAllocator
+from config import METRICS_PORT, TIMING_LOG, MASTER_POLL_SECONDS, SESSION_IDLE_MINUTES
+from sheets import open_sheet
+from record_store import RecordStore, SheetSync
+from duplicate_index import SubmittedKeyIndex
+from timing import to_minutes, outage_minutes
+from submission import CT_RATIOS, template_csv, form_errors, form_record, submission_key
+from metrics import inc, observe, timed_function, start_metrics_server, configure_timing_log
+
+logger = logging.getLogger(__name__)
+page_started = time.perf_counter()
 
 # ----------------- PAGE CONFIG -----------------
 st.set_page_config(
@@ -150,137 +167,271 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-# ----------------- GOOGLE SHEET CONNECTION -----------------
+# ----------------- METRICS -----------------
+@st.cache_resource
+def start_observability():
+    if TIMING_LOG:
+        configure_timing_log(TIMING_LOG)
+    if METRICS_PORT:
+        try:
+            return start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            # another worker on this host already serves the port
+            logger.warning("Metrics server not started on port %s: %s", METRICS_PORT, e)
+    return None
+
+start_observability()
+
+# ----------------- LOCAL RECORD STORE -----------------
+# Submissions are committed locally first; SheetSync replicates them to the
+# sheet in the background, so an unreachable sheet never stops entries
+# from being saved.
+@st.cache_resource
+def get_record_store():
+    return RecordStore()
+
 @st.cache_resource
-def get_google_sheet():
-    creds_dict = st.secrets["gcp_service_account"]
-    scope = [
-        "https://spreadsheets.google.com/feeds",
-        "https://www.googleapis.com/auth/drive"
-    ]
-    credentials = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(credentials)
-    return client.open("DTR_Indexation_Records").sheet1
+def get_application_number_allocator():
+    return ApplicationNumberAllocator()
 
+@st.cache_resource
+def get_submitted_key_index():
+    return SubmittedKeyIndex()
+
+# Only SheetSync talks to Google, from its own thread: the sheet is opened
+# (and the service account authenticated) when it first has rows to
+# append or the duplicate index to catch up, never on a script run.
+@st.cache_resource
+def get_sheet_sync():
+    return SheetSync(
+        get_record_store(), open_sheet=lambda: open_sheet(st.secrets), submitted_keys=get_submitted_key_index()
+    ).start()
+
+record_store = get_record_store()
+sheet_sync = get_sheet_sync()
+
+# ----------------- LOAD HIERARCHY -----------------
+# One shared bundle per process, never cache_data: the frame is backed by
+# memory-mapped columns and must not be pickled/copied per session. The reloader
+# watches the "DTR Master Information*.xlsx" batches and swaps in a new
+# snapshot with its indexes prebuilt; this run keeps the one it read here.
 try:
-    sheet = get_google_sheet()
+    master = master_reloader(MASTER_POLL_SECONDS).current
 except Exception as e:
-    st.error(f"Google Sheets connection failed: {e}")
-    sheet = None
+    st.error(f"Error loading master file: {e}")
+    master = None
 
-# ----------------- LOAD HIERARCHY -----------------
-@st.cache_data
-def load_hierarchy_data():
+def option_index(options, value):
+    # position of a prefilled value in a dropdown, first entry otherwise
     try:
-        hierarchy_path = r"DTR Master Information_05.xlsx"
-        return pd.read_excel(hierarchy_path)
-    except Exception as e:
-        st.error(f"Error loading master file: {e}")
+        return list(options).index(value)
+    except ValueError:
+        return 0
+
+master_manifest = master["manifest"] if master else None
+# Region partitions of the index; a Region's is mapped when it is first picked
+partitions = master["partitions"] if master else None
+
+# ----------------- SECTION STATE -----------------
+# Every form section below is a fragment, so a widget change reruns only
+# its own section. Sections hand their values to each other through
+# session_state; when a value that decides what the later sections render
+# (the DTR code, whether an MSN is confirmed) changes in a fragment-only
+# rerun, the whole page is rerun once. Only small values are kept: the
+# hierarchy selection is its Region and one path id into that Region's
+# shared index, not its names.
+def touch_session():
+    st.session_state._last_active = time.time()
+
+def publish(name, value, gate=None):
+    touch_session()
+    previous_gate = st.session_state.get(f"{name}_gate")
+    st.session_state[name] = value
+    st.session_state[f"{name}_gate"] = gate
+    if gate != previous_gate and not st.session_state.get("_full_run"):
+        st.rerun()
+
+def selected_path():
+    # {column: value} of the selected hierarchy path; None until a DTR code
+    # is picked, or when the snapshot it was picked in has been replaced
+    selected = st.session_state.get("hierarchy")
+    if selected is None or master_manifest is None or selected[0] != master_manifest["version"]:
         return None
+    return path_values(partitions.region(selected[1]), selected[2])
+
+def current_path():
+    # for the sections below the hierarchy; a newer master snapshot came in
+    # since the DTR was picked: rerun the page so the hierarchy section
+    # republishes the selection against it
+    path = selected_path()
+    if path is None:
+        st.rerun()
+    return path
+
+# ----------------- IDLE SESSIONS -----------------
+# An open but idle tab keeps its form state (and any uploaded file) on the
+# server. A timer fragment looks in once a minute; after
+# SESSION_IDLE_MINUTES without a change it drops the session's state and
+# the page shows a restart notice instead of the form, so no widget state
+# is held for it either until the officer comes back.
+def expire_session():
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    ctx = get_script_run_ctx()
+    if ctx is not None and runtime.exists():
+        runtime.get_instance().uploaded_file_mgr.remove_session_files(ctx.session_id)
+    st.session_state._expired = True
+    inc("dtr_sessions_expired_total")
+    st.rerun()
+
+@st.fragment(run_every=60)
+def idle_check():
+    last_active = st.session_state.get("_last_active")
+    if last_active is not None and time.time() - last_active > SESSION_IDLE_MINUTES * 60:
+        expire_session()
+
+def restart_session():
+    del st.session_state["_expired"]
 
-hierarchy_df = load_hierarchy_data()
+if st.session_state.get("_expired"):
+    st.info("⏳ निष्क्रियता के कारण सत्र समाप्त हुआ | Your session expired after inactivity")
+    st.button("🔄 फिर से शुरू करें | Start Again", on_click=restart_session, use_container_width=True)
+    st.stop()
+
+touch_session()
+if SESSION_IDLE_MINUTES:
+    idle_check()
+
+st.session_state._full_run = True
 
 # ----------------- SYSTEM INFORMATION SECTION -----------------
 st.markdown("<div class='custom-card'>", unsafe_allow_html=True)
 st.markdown(f"### 🗂️ सिस्टम जानकारी | System Information")
-st.markdown(f"Last Update 06/11/2025 12:00 PM ({hierarchy_df['Msn'].shape[0]}) Records Found")
+if master_manifest is not None:
+    last_update = datetime.fromisoformat(master_manifest["published_at"]).strftime("%d/%m/%Y %I:%M %p")
+    st.markdown(f"Last Update {last_update} ({master_manifest['rows']}) Records Found")
 
-if hierarchy_df is not None:
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="hierarchy")
+def hierarchy_section():
+    region = circle = division = substation = feeder = dtr = feeder_code = dtr_code = None
     with st.expander("🔽 विवरण चुनें | Select Details", expanded=True):
-        # Initialize session state for dropdowns
-        if 'region' not in st.session_state:
-            st.session_state.region = None
-        if 'circle' not in st.session_state:
-            st.session_state.circle = None
-        if 'division' not in st.session_state:
-            st.session_state.division = None
-        if 'substation' not in st.session_state:
-            st.session_state.substation = None
-        if 'feeder' not in st.session_state:
-            st.session_state.feeder = None
-        if 'dtr' not in st.session_state:
-            st.session_state.dtr = None
+        # ----------------- QUICK SEARCH -----------------
+        prefill = {}
+        search_query = st.text_input(
+            "🔎 MSN / DTR कोड / फीडर कोड से खोजें | Search by MSN, DTR Code or Feeder Code",
+            placeholder="सीरियल नंबर या कोड का शुरुआती भाग लिखें | Type a serial number or code prefix"
+        )
+        if search_query and partitions is not None:
+            matches = search_master(partitions.search_index(), search_query)
+            if matches:
+                match_no = st.selectbox(
+                    "📍 मिलान चुनें | Select Match",
+                    options=range(len(matches)),
+                    format_func=lambda i: f"{matches[i]['field']} {matches[i]['value']} → "
+                                          f"{matches[i]['Circle']} / {matches[i]['Feeder']}"
+                                          + (f" / {matches[i]['Dtr']}" if "Dtr" in matches[i] else "")
+                )
+                prefill = matches[match_no]
+            else:
+                st.warning("⚠️ कोई मिलान नहीं मिला | No match found")
 
         col1, col2 = st.columns(2)
         
         with col1:
+            region_options = partitions.regions
             region = st.selectbox(
                 "🌍 क्षेत्र (Region)", 
-                options=hierarchy_df["Region"].unique(),
-                index=0
+                options=region_options,
+                index=option_index(region_options, prefill.get("Region"))
             )
             
             if region:
-                circle_options = hierarchy_df[hierarchy_df["Region"] == region]["Circle"].unique()
+                region_index = partitions.region(region)
+                circle_options = hierarchy_children(region_index, region)
                 circle = st.selectbox(
                     "🏛️ सर्कल (Circle)", 
                     options=circle_options,
-                    index=0
+                    index=option_index(circle_options, prefill.get("Circle"))
                 )
                 
                 if circle:
-                    division_options = hierarchy_df[hierarchy_df["Circle"] == circle]["Division"].unique()
+                    division_options = hierarchy_children(region_index, region, circle)
                     division = st.selectbox(
                         "🏢 डिवीजन (Division)", 
                         options=division_options,
-                        index=0
+                        index=option_index(division_options, prefill.get("Division"))
                     )
                     
                     if division:
-                        substation_options = hierarchy_df[hierarchy_df["Division"] == division]["Sub station"].unique()
+                        substation_options = hierarchy_children(region_index, region, circle, division)
                         substation = st.selectbox(
                             "⚙️ उपकेंद्र (Substation)", 
                             options=substation_options,
-                            index=0
+                            index=option_index(substation_options, prefill.get("Sub station"))
                         )
         
         with col2:
-            if 'substation' in locals() and substation:
-                feeder_options = hierarchy_df[hierarchy_df["Sub station"] == substation]["Feeder"].unique()
+            if substation:
+                feeder_options = hierarchy_children(region_index, region, circle, division, substation)
                 feeder = st.selectbox(
                     "🔌 फीडर (Feeder)", 
                     options=feeder_options,
-                    index=0
+                    index=option_index(feeder_options, prefill.get("Feeder"))
                 )
                 
                 if feeder:
-                    dtr_options = hierarchy_df[hierarchy_df["Feeder"] == feeder]["Dtr"].unique()
+                    dtr_options = hierarchy_children(region_index, region, circle, division, substation, feeder)
                     dtr = st.selectbox(
                         "🧭 डीटीआर का नाम (DTR Name)", 
                         options=dtr_options,
-                        index=0
+                        index=option_index(dtr_options, prefill.get("Dtr"))
                     )
                     
                     if dtr:
-                        feeder_code_options = hierarchy_df[hierarchy_df["Dtr"] == dtr]["Feeder code"].unique()
+                        feeder_code_options = feeder_codes(region_index, region, circle, division, substation, feeder, dtr)
                         feeder_code = st.selectbox(
                             "💡 फीडर कोड (Feeder Code)", 
                             options=feeder_code_options,
-                            index=0
+                            index=option_index(feeder_code_options, prefill.get("Feeder code"))
                         )
                         
-                        dtr_code_options = hierarchy_df[hierarchy_df["Dtr"] == dtr]["Dtr code"].unique()
+                        dtr_code_options = dtr_codes(region_index, region, circle, division, substation, feeder, dtr)
                         dtr_code = st.selectbox(
                             "📟 डीटीआर कोड (DTR Code)", 
                             options=dtr_code_options,
-                            index=0
+                            index=option_index(dtr_code_options, prefill.get("Dtr code"))
                         )
+
+    # the MSN section preselects a searched meter
+    st.session_state.prefill_msn = prefill.get("Msn")
+    node = None if dtr_code is None else path_id(region_index, region, circle, division, substation, feeder, dtr, feeder_code, dtr_code)
+    publish("hierarchy", None if node is None else (master_manifest["version"], region, node), gate=dtr_code)
+
+if partitions is not None:
+    hierarchy_section()
 else:
     st.error("❌ मास्टर डेटा लोड नहीं हो सका | Master data could not be loaded")
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 # ----------------- MSN CONFIRMATION SECTION -----------------
-if hierarchy_df is not None and 'dtr_code' in locals() and dtr_code:
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="msn")
+def msn_section():
+    path = current_path()
+    dtr_code = path["Dtr code"]
+    msn_auto = new_msn = None
+
     st.markdown("<div class='custom-card'>", unsafe_allow_html=True)
     
     try:
-        msn_options = hierarchy_df[hierarchy_df["Dtr code"] == dtr_code]["Msn"].unique()
+        msn_options = dtr_msns(partitions.region(path["Region"]), dtr_code)
         if len(msn_options) > 0:
             msn_auto = st.selectbox(
                 "🔢 डीटीआर मीटर सीरियल नंबर (DTR Meter Serial Number)", 
                 options=msn_options,
-                index=0
+                index=option_index(msn_options, st.session_state.get("prefill_msn"))
             )
             
             st.markdown("### ✅ डीटीआर मीटर सीरियल नंबर की पुष्टि करें | Confirm DTR Meter Serial Number")
@@ -288,6 +439,9 @@ if hierarchy_df is not None and 'dtr_code' in locals() and dtr_code:
             col1, col2 = st.columns([2, 1])
             with col1:
                 st.info(f"**🔍 MDM में दर्ज डीटीआर मीटर सीरियल नंबर:** {msn_auto}")
+                mdm_msn = master["corrected"].get((dtr_code, msn_auto))
+                if mdm_msn:
+                    st.caption(f"✏️ पिछली प्रविष्टियों में सुधारा गया, MDM में {mdm_msn} | Corrected by earlier submissions, MDM has {mdm_msn}")
             
             with col2:
                 confirm = st.radio(
@@ -328,26 +482,27 @@ if hierarchy_df is not None and 'dtr_code' in locals() and dtr_code:
     st.markdown("### 🔌 CT Ratio Selection")
     ct_ratio = st.selectbox(
         "⚡ CT Ratio", 
-        options=["(100/5A)", "(200/5A)", "(300/5A)", "(400/5A)", "(500/5A)", "(600/5A)"],
+        options=CT_RATIOS,
         index=0
     )
     
     st.markdown("</div>", unsafe_allow_html=True)
 
+    publish("msn", {
+        "msn_auto": msn_auto,
+        "new_msn": new_msn,
+        "final_msn": final_msn,
+        "ct_ratio": ct_ratio,
+    }, gate=bool(final_msn))
+
+if partitions is not None and selected_path() is not None:
+    msn_section()
+
 # ----------------- SIMPLE TIME PICKER FUNCTION WITH VALIDATION -----------------
 def simple_time_picker(label, key_prefix, min_hour=None, min_minute=None, min_ampm=None):
     st.markdown(f"**{label}**")
     col1, col2, col3 = st.columns(3)
     
-    # Convert time to 24-hour format for comparison
-    def convert_to_24h(hour, minute, ampm):
-        hour_int = int(hour)
-        if ampm == "PM" and hour_int != 12:
-            hour_int += 12
-        elif ampm == "AM" and hour_int == 12:
-            hour_int = 0
-        return hour_int, int(minute)
-    
     with col1:
         hour_options = [f"{i:02d}" for i in range(1, 13)]
         hour = st.selectbox(
@@ -372,18 +527,23 @@ def simple_time_picker(label, key_prefix, min_hour=None, min_minute=None, min_am
             key=f"{key_prefix}_ampm"
         )
     
-    # Validation for on-time to be after off-time
+    # Validation for on-time to be after off-time (or the next day, for an
+    # outage that ran past midnight)
     if min_hour and min_minute and min_ampm:
-        current_time_24h = convert_to_24h(hour, minute, am_pm)
-        min_time_24h = convert_to_24h(min_hour, min_minute, min_ampm)
+        current_minutes = to_minutes(hour, minute, am_pm)
+        min_minutes = to_minutes(min_hour, min_minute, min_ampm)
         
-        if current_time_24h < min_time_24h:
+        if outage_minutes(min_minutes, current_minutes) is None:
             st.warning(f"⚠️ DTR चालू समय बंद समय ({min_hour}:{min_minute} {min_ampm}) के बाद होना चाहिए | DTR on time must be after off time")
+        elif current_minutes < min_minutes:
+            st.info("🌙 चालू समय अगले दिन का माना जाएगा | On time is taken as the next day")
     
     return f"{hour}:{minute} {am_pm}"
 
 # ----------------- DATE & TIME SECTION -----------------
-if 'final_msn' in locals() and final_msn:
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="timing")
+def timing_section():
     st.markdown("<div class='custom-card'>", unsafe_allow_html=True)
     st.markdown("### ⏱️ डीटीआर संचालन समय | DTR Operation Timing")
     
@@ -414,7 +574,16 @@ if 'final_msn' in locals() and final_msn:
     
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ----------------- OFFICER INFORMATION -----------------
+    publish("timing", {
+        "date": date,
+        "dtr_off_time": dtr_off_time,
+        "dtr_on_time": dtr_on_time,
+    })
+
+# ----------------- OFFICER INFORMATION -----------------
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="officer")
+def officer_section():
     st.markdown("<div class='custom-card'>", unsafe_allow_html=True)
     st.markdown("### 👤 अधिकारी जानकारी | Officer Information")
     
@@ -435,85 +604,57 @@ if 'final_msn' in locals() and final_msn:
     
     st.markdown("</div>", unsafe_allow_html=True)
 
-    # ----------------- SUBMIT BUTTON -----------------
+    publish("officer", {
+        "ae_je_name": ae_je_name,
+        "mobile_number": mobile_number,
+    })
+
+# ----------------- SUBMIT BUTTON -----------------
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="submit")
+def submit_section():
+    # the other sections' latest values, as published by their fragments
+    path, msn, timing, officer = current_path(), st.session_state.msn, st.session_state.timing, st.session_state.officer
+
     st.markdown("<br>", unsafe_allow_html=True)
     
     submit_clicked = st.button("🚀 डेटा सबमिट करें | Submit Data", use_container_width=True, type="primary")
     
     if submit_clicked:
         # Validation
-        errors = []
-        
-        if not ae_je_name:
-            errors.append("❌ कृपया अधिकारी का नाम दर्ज करें | Please enter officer name")
-        
-        if not mobile_number:
-            errors.append("❌ कृपया मोबाइल नंबर दर्ज करें | Please enter mobile number")
-        elif len(mobile_number) != 10 or not mobile_number.isdigit():
-            errors.append("❌ कृपया वैध 10-अंकीय मोबाइल नंबर दर्ज करें | Please enter valid 10-digit mobile number")
-        
-        # Time validation
-        off_hour = st.session_state.get("off_hour", "01")
-        off_minute = st.session_state.get("off_minute", "00")
-        off_ampm = st.session_state.get("off_ampm", "AM")
-        on_hour = st.session_state.get("on_hour", "01")
-        on_minute = st.session_state.get("on_minute", "00")
-        on_ampm = st.session_state.get("on_ampm", "AM")
-        
-        def convert_to_minutes(hour, minute, ampm):
-            hour_int = int(hour)
-            minute_int = int(minute)
-            if ampm == "PM" and hour_int != 12:
-                hour_int += 12
-            elif ampm == "AM" and hour_int == 12:
-                hour_int = 0
-            return hour_int * 60 + minute_int
-        
-        off_minutes = convert_to_minutes(off_hour, off_minute, off_ampm)
-        on_minutes = convert_to_minutes(on_hour, on_minute, on_ampm)
-        
-        if on_minutes <= off_minutes:
-            errors.append("❌ DTR चालू समय बंद समय के बाद होना चाहिए | DTR on time must be after off time")
+        errors = form_errors(officer["ae_je_name"], officer["mobile_number"],
+                             timing["dtr_off_time"], timing["dtr_on_time"])
         
+        # Duplicate check: same DTR code + MSN already indexed for this date,
+        # against the local index SheetSync keeps caught up with the sheet
+        submitted_keys = get_submitted_key_index()
+        key = submission_key(path, msn, timing)
+        if not errors:
+            if not submitted_keys.claim(*key):
+                errors.append("❌ यह डीटीआर और मीटर सीरियल नंबर इस तारीख के लिए पहले ही दर्ज है | This DTR and meter serial number is already indexed for this date")
+
         if errors:
+            inc("dtr_submission_failures_total", reason="validation")
             for error in errors:
                 st.error(error)
         else:
             try:
                 # Generate application number
-                application_number = f"{datetime.now().strftime('%d%m%Y')}{len(sheet.get_all_values()) + 1:04d}"
+                application_number = get_application_number_allocator().next_number()
+                submitted_keys.assign(*key, application_number)
                 
-                # Prepare data for submission
-                new_data = [
-                    region if 'region' in locals() else "",
-                    circle if 'circle' in locals() else "",
-                    division if 'division' in locals() else "",
-                    substation if 'substation' in locals() else "",
-                    feeder if 'feeder' in locals() else "",
-                    dtr if 'dtr' in locals() else "",
-                    dtr_code if 'dtr_code' in locals() else "",
-                    feeder_code if 'feeder_code' in locals() else "",
-                    msn_auto if 'msn_auto' in locals() else "",
-                    new_msn if 'new_msn' in locals() and new_msn else "",
-                    final_msn,
-                    dtr_off_time,
-                    dtr_on_time,
-                    date.strftime("%d-%m-%Y"),
-                    ae_je_name,
-                    mobile_number,
-                    application_number,
-                    ct_ratio  # Added CT Ratio to the data
-                ]
-                
-                # Submit to Google Sheets
-                if sheet:
-                    sheet.append_row(new_data)
+                # Commit locally; SheetSync appends it to Google Sheets in batches
+                record_store.add(form_record(path, msn, timing, officer, application_number))
+                sheet_sync.notify()
+                inc("dtr_submissions_total", source="form")
                 
                 # SUCCESS MESSAGE
                 st.balloons()
                 st.markdown("<div class='custom-card success-card'>", unsafe_allow_html=True)
                 st.markdown("### 🎉 सफलता | Success!")
                 st.success("✅ डेटा सफलतापूर्वक सबमिट हो गया! | Data submitted successfully!")
+                if sheet_sync.last_error is not None:
+                    st.info("📶 डेटा सर्वर पर सुरक्षित है, कनेक्शन मिलने पर Google Sheet में भेजा जाएगा | Saved on the server, will sync to Google Sheets once the connection is back")
                 
                 # CONFIRMATION DETAILS
                 st.markdown(f"""
@@ -531,14 +672,14 @@ if 'final_msn' in locals() and final_msn:
                         </h4>
                         <div style="display: grid; grid-template-columns: 1fr 1fr; gap: 15px;">
                             <div><b>🧾 आवेदन संख्या:</b><br>{application_number}</div>
-                            <div><b>🌐 फीडर:</b><br>{feeder if 'feeder' in locals() else 'N/A'}</div>
-                            <div><b>💡 फीडर कोड:</b><br>{feeder_code if 'feeder_code' in locals() else 'N/A'}</div>
-                            <div><b>🧭 डीटीआर नाम:</b><br>{dtr if 'dtr' in locals() else 'N/A'}</div>
-                            <div><b>🔢 डीटीआर MSN:</b><br>{final_msn}</div>
-                            <div><b>⚡ CT Ratio:</b><br>{ct_ratio}</div>
-                            <div><b>⏰ बंद समय:</b><br>{dtr_off_time}</div>
-                            <div><b>⚡ चालू समय:</b><br>{dtr_on_time}</div>
-                            <div><b>📅 दिनांक:</b><br>{date.strftime('%d-%m-%Y')}</div>
+                            <div><b>🌐 फीडर:</b><br>{path['Feeder'] or 'N/A'}</div>
+                            <div><b>💡 फीडर कोड:</b><br>{path['Feeder code'] or 'N/A'}</div>
+                            <div><b>🧭 डीटीआर नाम:</b><br>{path['Dtr'] or 'N/A'}</div>
+                            <div><b>🔢 डीटीआर MSN:</b><br>{msn['final_msn']}</div>
+                            <div><b>⚡ CT Ratio:</b><br>{msn['ct_ratio']}</div>
+                            <div><b>⏰ बंद समय:</b><br>{timing['dtr_off_time']}</div>
+                            <div><b>⚡ चालू समय:</b><br>{timing['dtr_on_time']}</div>
+                            <div><b>📅 दिनांक:</b><br>{key[2]}</div>
                         </div>
                     </div>
                 """, unsafe_allow_html=True)
@@ -565,8 +706,77 @@ if 'final_msn' in locals() and final_msn:
                 """, unsafe_allow_html=True)
                 
             except Exception as e:
+                submitted_keys.release(*key)
+                inc("dtr_submission_failures_total", reason="error")
                 st.error(f"❌ सबमिट करने में त्रुटि | Submission Error: {str(e)}")
 
+if selected_path() is not None and st.session_state.get("msn", {}).get("final_msn"):
+    timing_section()
+    officer_section()
+    submit_section()
+
+# ----------------- BULK UPLOAD -----------------
+@st.fragment
+@timed_function("dtr_rerun_seconds", scope="bulk_upload")
+def bulk_upload_section():
+    touch_session()
+    with st.expander("📤 बल्क अपलोड | Bulk Upload (CSV / Excel)", expanded=False):
+        st.download_button(
+            "📄 टेम्पलेट डाउनलोड करें | Download Template",
+            data=template_csv(),
+            file_name="dtr_indexation_template.csv",
+            mime="text/csv"
+        )
+        uploaded = st.file_uploader(
+            "फ़ाइल चुनें | Choose File", type=["csv", "xlsx"]
+        )
+        if uploaded is not None:
+            # pandas and the column-wise rules load with the first upload
+            from bulk_upload import read_upload, validate_upload, submit_records
+
+            try:
+                upload_df = read_upload(uploaded.getvalue(), uploaded.name)
+            except Exception as e:
+                st.error(f"❌ फ़ाइल पढ़ने में त्रुटि | Could not read file: {e}")
+                upload_df = None
+
+            if upload_df is not None:
+                valid_records, report = validate_upload(upload_df, partitions.lookup())
+                st.markdown(f"**{len(valid_records)} / {len(report)}** पंक्तियाँ मान्य | rows valid")
+                invalid = report[report["Errors"] != ""]
+                if len(invalid):
+                    st.warning(f"⚠️ {len(invalid)} पंक्तियों में त्रुटि | rows with errors")
+                    st.dataframe(invalid, use_container_width=True, hide_index=True)
+
+                if len(valid_records) and st.button("🚀 मान्य पंक्तियाँ सबमिट करें | Submit Valid Rows", use_container_width=True):
+                    try:
+                        submitted, duplicates = submit_records(
+                            valid_records,
+                            get_application_number_allocator(),
+                            get_submitted_key_index(),
+                            record_store
+                        )
+                    except Exception as e:
+                        inc("dtr_submission_failures_total", len(valid_records), reason="error")
+                        st.error(f"❌ सबमिट करने में त्रुटि | Submission Error: {str(e)}")
+                        return
+                    sheet_sync.notify()
+                    inc("dtr_submissions_total", len(submitted), source="bulk")
+                    st.success(f"✅ {len(submitted)} रिकॉर्ड सबमिट हुए | records submitted")
+                    if len(duplicates):
+                        report.loc[duplicates, "Errors"] = "already indexed for this date"
+                        st.warning(f"⚠️ {len(duplicates)} रिकॉर्ड पहले से दर्ज थे | records were already indexed")
+                    report["Application number"] = submitted["application_number"]
+                    st.download_button(
+                        "📥 परिणाम डाउनलोड करें | Download Result",
+                        data=report.to_csv(index=False).encode("utf-8"),
+                        file_name="dtr_indexation_bulk_result.csv",
+                        mime="text/csv"
+                    )
+
+if partitions is not None:
+    bulk_upload_section()
+
 # ----------------- FOOTER -----------------
 st.markdown("""
     <div class='footer'>
@@ -599,3 +809,7 @@ try:
         st.image("download (1).png", width=120, caption="Technology Partner: Esyasoft Technologies")
 except:
     pass
+
+# end of a full-page run; from here on only fragments rerun until the next one
+st.session_state._full_run = False
+observe("dtr_rerun_seconds", time.perf_counter() - page_started, scope="page")
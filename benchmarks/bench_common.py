@@ -0,0 +1,69 @@
+import asyncio
+import os
+import socket
+import subprocess
+import time
+import urllib.request
+
+# ----------------- BENCHMARK HELPERS -----------------
+# What the benchmarks (and launch_workers.py) share: a free port to start
+# a portal on, waiting for its health check, one script run over the
+# websocket as a browser would send it, the commit a result belongs to
+# and the percentile every report uses.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_healthy(port, timeout, process=None, interval=0.02):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"streamlit exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(interval)
+    raise TimeoutError(f"server on port {port} did not come up")
+
+
+async def run_script_once(port, timeout):
+    # one full script run of a new session, as the browser's first load
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+    from websockets.asyncio.client import connect
+
+    async with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                       max_size=None) as conn:
+        request = BackMsg()
+        request.rerun_script.SetInParent()
+        await conn.send(request.SerializeToString())
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await asyncio.wait_for(conn.recv(), timeout))
+            if message.WhichOneof("type") == "script_finished":
+                return
+
+
+def git_commit(tree=ROOT):
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=tree, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values, fraction):
+    # nearest rank, fraction in 0..1; None for no values
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
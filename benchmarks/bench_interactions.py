@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from bench_common import RESULTS_DIR, ROOT, free_port, git_commit, percentile, wait_healthy
+
+# ----------------- INTERACTION BENCHMARK -----------------
+# Server time per widget interaction with many officers on one portal
+# process. `streamlit run` is started on the given tree (this checkout by
+# default, or an older one checked out with `git worktree add`), N sessions
+# connect over the websocket as the browser would, and each then changes
+# the off-time minute M times back to back while the others do the same.
+# The clock for an interaction runs from sending the widget change to that
+# run's script_finished.
+#
+# A session sends each change the way the browser does: with the id of the
+# fragment the widget belongs to, so only that section reruns. --mode page
+# sends it without one and forces the old full-page rerun on the same
+# tree. When the tree serves /metrics, the dtr_rerun_seconds histogram
+# (script-thread time per scope) is read before and after, so the server's
+# own time is reported beside what the sessions saw, together with the
+# server process's CPU time per interaction (from /proc, so Linux only).
+#
+#   python benchmarks/bench_interactions.py --sessions 25 --interactions 20
+#   python benchmarks/bench_interactions.py --mode page
+#   git worktree add /tmp/dtr-base <older-commit>
+#   python benchmarks/bench_interactions.py --app /tmp/dtr-base/app.py --compare <commit>-fragment
+WIDGET_KEY = "off_minute"
+HISTOGRAM = re.compile(r'^dtr_rerun_seconds_(sum|count)\{scope="([^"]+)"\} (\S+)$')
+
+
+class Session:
+    def __init__(self, conn):
+        self.conn = conn
+        self.widget = None
+        self.fragment_id = ""
+
+    async def run(self, client_state, timeout):
+        # one script run -> bytes received until it finished
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        request = BackMsg()
+        request.rerun_script.CopyFrom(client_state)
+        await self.conn.send(request.SerializeToString())
+        received = 0
+        while True:
+            data = await asyncio.wait_for(self.conn.recv(), timeout)
+            received += len(data)
+            message = ForwardMsg()
+            message.ParseFromString(data)
+            kind = message.WhichOneof("type")
+            if kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                element = message.delta.new_element
+                if element.WhichOneof("type") == "selectbox" and element.selectbox.id.endswith(WIDGET_KEY):
+                    self.widget = element.selectbox.id
+                    self.fragment_id = message.delta.fragment_id
+            elif kind == "script_finished":
+                return received
+
+
+async def drive(port, interactions, mode, timeout, barrier):
+    from streamlit.proto.ClientState_pb2 import ClientState
+    from websockets.asyncio.client import connect
+
+    async with connect(f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+                       max_size=None) as conn:
+        session = Session(conn)
+        await session.run(ClientState(), timeout)
+        if session.widget is None:
+            raise RuntimeError(f"no '{WIDGET_KEY}' selectbox on the page")
+        # first renders are full pages and not counted: every session gets
+        # there before any starts changing the minute
+        await barrier()
+
+        timings = []
+        for i in range(interactions):
+            state = ClientState()
+            widget = state.widget_states.widgets.add()
+            widget.id = session.widget
+            widget.string_value = f"{(i + 1) % 60:02d}"
+            if mode == "fragment":
+                state.fragment_id = session.fragment_id
+            started = time.perf_counter()
+            received = await session.run(state, timeout)
+            timings.append(((time.perf_counter() - started) * 1000, received))
+        return timings, session.fragment_id
+
+
+def read_histograms(metrics_port):
+    # {scope: [sum seconds, count]} from the portal's /metrics
+    with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=10) as response:
+        text = response.read().decode()
+    found = {}
+    for line in text.splitlines():
+        match = HISTOGRAM.match(line)
+        if match:
+            kind, scope, value = match.groups()
+            found.setdefault(scope, [0.0, 0.0])[kind == "count"] = float(value)
+    return found
+
+
+async def load(port, sessions, interactions, mode, timeout, on_start):
+    arrived = 0
+    everyone = asyncio.Event()
+
+    async def barrier():
+        nonlocal arrived
+        arrived += 1
+        if arrived == sessions:
+            on_start()
+            everyone.set()
+        await everyone.wait()
+
+    results = await asyncio.gather(*[
+        drive(port, interactions, mode, timeout, barrier) for _ in range(sessions)
+    ])
+    return results
+
+
+def cpu_seconds(pid):
+    # user + system CPU time of a process so far, from /proc/<pid>/stat
+    with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def run_benchmark(app, sessions, interactions, mode, timeout=600):
+    port = free_port()
+    metrics_port = free_port()
+    data_dir = tempfile.mkdtemp(prefix="dtr-interactions-")
+    # never touch the real sheet or the real store
+    env = dict(os.environ, DTR_SHEETS_BACKEND="local", DTR_DATA_DIR=data_dir,
+               DTR_METRICS_PORT=str(metrics_port), DTR_SESSION_IDLE_MINUTES="0")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", app, "--server.port", str(port),
+         "--server.headless", "true", "--browser.gatherUsageStats", "false"],
+        env=env, cwd=os.path.dirname(os.path.abspath(app)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    clock = {}
+
+    def on_start():
+        try:
+            clock["before"] = read_histograms(metrics_port)
+        except OSError:
+            clock["before"] = None  # a tree without /metrics
+        clock["started"] = time.perf_counter()
+        clock["cpu"] = cpu_seconds(process.pid)
+
+    try:
+        wait_healthy(port, timeout, process)
+        # the first session publishes the master snapshot: keep it out
+        asyncio.run(load(port, 1, 0, mode, timeout, lambda: None))
+        results = asyncio.run(load(port, sessions, interactions, mode, timeout, on_start))
+        elapsed = time.perf_counter() - clock["started"]
+        cpu = cpu_seconds(process.pid) - clock["cpu"]
+        after = read_histograms(metrics_port) if clock["before"] is not None else None
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    latencies = [ms for timings, _ in results for ms, _ in timings]
+    received = [size for timings, _ in results for _, size in timings]
+    fragment = any(fragment_id for _, fragment_id in results)
+    server = None
+    if after is not None:
+        server = {}
+        for scope, (total, count) in after.items():
+            before_total, before_count = clock["before"].get(scope, [0.0, 0.0])
+            if count > before_count:
+                server[scope] = {
+                    "runs": int(count - before_count),
+                    "mean_ms": round((total - before_total) / (count - before_count) * 1000, 1),
+                }
+    return {
+        "commit": git_commit(os.path.dirname(os.path.abspath(app))),
+        "mode": mode if fragment else "page",
+        "sessions": sessions,
+        "interactions": len(latencies),
+        "throughput_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "median": round(percentile(latencies, 0.5), 1),
+            "p90": round(percentile(latencies, 0.9), 1),
+            "p99": round(percentile(latencies, 0.99), 1),
+            "max": round(max(latencies), 1),
+        },
+        "kb_per_interaction": round(sum(received) / len(received) / 1024, 1),
+        # the server process's CPU time over the run, shared out per interaction
+        "cpu_ms_per_interaction": round(cpu / len(latencies) * 1000, 1),
+        "server": server,
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"commit {report['commit']} ({report['mode']} reruns): {report['sessions']} sessions, "
+          f"{report['interactions']} interactions, {report['throughput_per_s']}/s, "
+          f"{report['kb_per_interaction']} KB and {report['cpu_ms_per_interaction']} ms of server CPU each")
+    line = "  ".join(f"{name} {value} ms" for name, value in report["latency_ms"].items())
+    if baseline:
+        line += f"   median vs {baseline['commit']} ({baseline['mode']}): " \
+                f"{report['latency_ms']['median'] / baseline['latency_ms']['median']:.2f}x"
+    print(f"  per interaction: {line}")
+    for scope, stats in (report["server"] or {}).items():
+        print(f"  dtr_rerun_seconds{{scope={scope}}}: {stats['runs']} runs, mean {stats['mean_ms']} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server time per widget interaction under concurrent sessions")
+    parser.add_argument("--app", default=os.path.join(ROOT, "app.py"), help="app.py of the tree to run")
+    parser.add_argument("--sessions", type=int, default=25)
+    parser.add_argument("--interactions", type=int, default=20, help="minute changes per session")
+    parser.add_argument("--mode", choices=["fragment", "page"], default="fragment")
+    parser.add_argument("--compare", help="saved result to compare against, as <commit>-<mode>")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.app, args.sessions, args.interactions, args.mode)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"interactions-{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    name = f"interactions-{result['commit']}-{result['mode']}.json"
+    with open(os.path.join(RESULTS_DIR, name), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_common import RESULTS_DIR, ROOT, git_commit, percentile
+
+# ----------------- PORTAL BENCHMARK -----------------
+# Drives app.py headlessly with Streamlit's AppTest: many simulated officer
+# sessions spread over worker processes, against the LocalWorksheet
+# stand-in (no Google calls) and a throw-away data directory. Reports latency percentiles per step
+# and memory per session, and saves them under benchmarks/results/ keyed
+# by commit so runs can be compared.
+#
+#   python benchmarks/bench_portal.py --sessions 20 --concurrency 8
+#   python benchmarks/bench_portal.py --compare <older-commit>
+APP = os.path.join(ROOT, "app.py")
+STEPS = ["master_load", "session_start", "dropdown_cascade", "msn_lookup", "submit"]
+
+
+def timed(timings, step, fn):
+    start = time.perf_counter()
+    result = fn()
+    timings.setdefault(step, []).append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def widget(elements, label_part):
+    return next(element for element in elements if label_part in element.label)
+
+
+def run_session(msn, timings):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP, default_timeout=300)
+    timed(timings, "session_start", at.run)
+
+    # walk the cascade: another region, then another circle (seeded per
+    # session so runs stay comparable)
+    rng = random.Random(msn)
+    region = widget(at.selectbox, "Region")
+    if len(region.options) > 1:
+        timed(timings, "dropdown_cascade", lambda: region.set_value(rng.choice(region.options)).run())
+    circle = widget(at.selectbox, "Circle")
+    if len(circle.options) > 1:
+        timed(timings, "dropdown_cascade", lambda: circle.set_value(rng.choice(circle.options)).run())
+
+    timed(timings, "msn_lookup", lambda: widget(at.text_input, "Search").input(msn).run())
+
+    widget(at.text_input, "AE/JE").input("Benchmark Officer")
+    widget(at.text_input, "Mobile").input("9876543210")
+    at.selectbox(key="on_hour").set_value("11")
+    at.run()
+    timed(timings, "submit", lambda: widget(at.button, "Submit Data").click().run())
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return at
+
+
+def run_worker(msns):
+    # One simulated server process. AppTest drives a process-wide Streamlit
+    # runtime, so sessions inside a worker run one after another and
+    # concurrency comes from running several workers side by side.
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+
+    timings = {}
+    # first run in the process pays for master + index loading
+    timed(timings, "master_load", lambda: AppTest.from_file(APP, default_timeout=300).run())
+
+    sessions = []
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for msn in msns:
+        sessions.append(run_session(msn, timings))
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return timings, held, len(sessions)
+
+
+def run_benchmark(sessions, concurrency):
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    from master_ingest import load_snapshot
+    from hierarchy import HIERARCHY_LEVELS, CODE_COLUMNS
+
+    master, _ = load_snapshot()
+    # only meters the cascade can reach, so every session ends on a form
+    reachable = master.dropna(subset=HIERARCHY_LEVELS + CODE_COLUMNS + ["Msn"])
+    msns = reachable["Msn"].astype(str).sample(sessions, random_state=7).tolist()
+    chunks = [msns[i::concurrency] for i in range(concurrency) if msns[i::concurrency]]
+
+    timings = {}
+    held = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+        for worker_timings, worker_held, _ in executor.map(run_worker, chunks):
+            for step, values in worker_timings.items():
+                timings.setdefault(step, []).extend(values)
+            held += worker_held
+    wall = time.perf_counter() - started
+
+    return {
+        "commit": git_commit(),
+        "sessions": sessions,
+        "concurrency": len(chunks),
+        "wall_s": round(wall, 2),
+        "memory_per_session_kb": round(held / sessions / 1024, 1),
+        "steps": {
+            step: {
+                "n": len(timings.get(step, [])),
+                "p50_ms": round(percentile(timings.get(step, []), 0.5) or 0, 1),
+                "p95_ms": round(percentile(timings.get(step, []), 0.95) or 0, 1),
+                "p99_ms": round(percentile(timings.get(step, []), 0.99) or 0, 1),
+            }
+            for step in STEPS
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"commit {report['commit']}: {report['sessions']} sessions x{report['concurrency']} "
+          f"in {report['wall_s']}s, {report['memory_per_session_kb']} KB/session")
+    print(f"{'step':<18}{'n':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}" + ("   p50 vs base" if baseline else ""))
+    for step, stats in report["steps"].items():
+        line = f"{step:<18}{stats['n']:>5}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        if baseline and baseline["steps"].get(step, {}).get("p50_ms"):
+            line += f"   {stats['p50_ms'] / baseline['steps'][step]['p50_ms']:.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless load test of the DTR indexation portal")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--compare", help="commit whose saved result to compare against")
+    args = parser.parse_args()
+
+    # never touch the real sheet or the real local store
+    os.environ["DTR_SHEETS_BACKEND"] = "local"
+    os.environ["DTR_DATA_DIR"] = tempfile.mkdtemp(prefix="dtr-bench-")
+
+    result = run_benchmark(args.sessions, args.concurrency)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"{result['commit']}.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_common import RESULTS_DIR, ROOT, free_port, git_commit, percentile, run_script_once, wait_healthy
+
+# ----------------- STARTUP BENCHMARK -----------------
+# Time to first render of a fresh portal process: `streamlit run app.py`
+# is started, a session connects as soon as the server answers its health
+# check, and the clock stops when that session's first script run
+# finishes. Streamlit runs the script (and so imports the portal's
+# modules) only when the first session connects, so both halves count.
+# Runs against the LocalWorksheet stand-in and a throw-away data
+# directory; the first process publishes the master snapshot and is
+# reported apart as the cold start. Results are saved under
+# benchmarks/results/ keyed by commit, like bench_portal.
+#
+#   python benchmarks/bench_startup.py --runs 5
+#   python benchmarks/bench_startup.py --compare <older-commit>
+APP = os.path.join(ROOT, "app.py")
+STEPS = ["server_ready", "first_render", "time_to_first_render"]
+
+
+def run_once(env, timeout=300):
+    # -> (server ready, first script run, total) in ms
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", APP, "--server.port", str(port),
+         "--server.headless", "true", "--browser.gatherUsageStats", "false"],
+        env=env, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_healthy(port, timeout, process)
+        ready = time.perf_counter()
+        asyncio.run(run_script_once(port, timeout))
+        rendered = time.perf_counter()
+    finally:
+        process.terminate()
+        process.wait()
+    return (ready - started) * 1000, (rendered - ready) * 1000, (rendered - started) * 1000
+
+
+def run_benchmark(runs):
+    data_dir = tempfile.mkdtemp(prefix="dtr-startup-")
+    # never touch the real sheet, the real store or a metrics port
+    env = dict(os.environ, DTR_SHEETS_BACKEND="local", DTR_DATA_DIR=data_dir, DTR_METRICS_PORT="0")
+    try:
+        cold = run_once(env)
+        timings = [run_once(env) for _ in range(runs)]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "runs": runs,
+        "cold_ms": round(cold[2], 1),
+        "steps": {
+            step: {
+                "median_ms": round(percentile(values, 0.5), 1),
+                "min_ms": round(min(values), 1),
+                "max_ms": round(max(values), 1),
+            }
+            for step, values in zip(STEPS, zip(*timings))
+        },
+    }
+
+
+def print_report(report, baseline=None):
+    print(f"commit {report['commit']}: {report['runs']} warm starts, cold start {report['cold_ms']} ms")
+    print(f"{'step':<24}{'median ms':>11}{'min ms':>10}{'max ms':>10}" + ("   median vs base" if baseline else ""))
+    for step, stats in report["steps"].items():
+        line = f"{step:<24}{stats['median_ms']:>11}{stats['min_ms']:>10}{stats['max_ms']:>10}"
+        if baseline and baseline["steps"].get(step, {}).get("median_ms"):
+            line += f"   {stats['median_ms'] / baseline['steps'][step]['median_ms']:.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to first render of a fresh portal process")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare", help="commit whose saved result to compare against")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.runs)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(RESULTS_DIR, f"startup-{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(os.path.join(RESULTS_DIR, f"startup-{result['commit']}.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
@@ -0,0 +1,137 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from hierarchy import HIERARCHY_LEVELS, CODE_COLUMNS
+from sheets import RECORD_COLUMNS
+from submission import CT_RATIOS, TEMPLATE_COLUMNS
+from timing import MAX_OUTAGE_MINUTES, clock_times, format_times, outage_durations, parse_dates, parse_times
+
+# ----------------- BULK UPLOAD -----------------
+# Many indexations at once from a CSV/xlsx sheet. Every rule of the form is
+# applied column-wise over the whole upload (no per-row Python loop), and
+# the rows that pass become records in exactly the form's row layout.
+# The upload template and the CT ratios are shared with the form
+# (submission.py).
+
+
+def read_upload(data, filename):
+    # everything as text: mobile numbers and codes must keep leading zeros
+    excel = filename.lower().endswith((".xlsx", ".xls"))
+    if excel:
+        df = pd.read_excel(io.BytesIO(data), dtype=str)
+    else:
+        df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+    df.columns = [str(column).strip() for column in df.columns]
+    missing = [column for column in TEMPLATE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    df = df[TEMPLATE_COLUMNS].fillna("").apply(lambda column: column.str.strip())
+    if excel:
+        # time-formatted cells come through as 24-hour "HH:MM:SS" text
+        for column in ("Off time", "On time"):
+            df[column] = clock_times(df[column])
+    return df
+
+
+def build_master_lookup(master_df):
+    # one row per Dtr code with its path, plus every known (Dtr code, Msn)
+    columns = HIERARCHY_LEVELS + CODE_COLUMNS
+    dtrs = master_df[columns + ["Msn"]].dropna(subset=columns).astype(str)
+    paths = dtrs[columns].drop_duplicates("Dtr code")
+    pairs = dtrs[["Dtr code", "Msn"]].drop_duplicates()
+    pairs["Known msn"] = True
+    return {"paths": paths.set_index("Dtr code"), "pairs": pairs}
+
+
+def validate_upload(df, lookup, within=None):
+    # within: optional group label per row (the API validates many requests
+    # in one pass); a repeated key is then only an error inside its group
+    n = len(df)
+    errors = pd.Series([""] * n, index=df.index, dtype=object)
+
+    def fail(mask, message):
+        errors[mask] = errors[mask] + message + "; "
+
+    paths = lookup["paths"].reindex(df["Dtr code"])
+    paths.index = df.index
+    fail(paths["Region"].isna(), "DTR code not found in master")
+
+    fail(df["Msn"] == "", "MSN missing")
+    known = df[["Dtr code", "Msn"]].merge(lookup["pairs"], on=["Dtr code", "Msn"], how="left")["Known msn"]
+    known = known.fillna(False).astype(bool).to_numpy()
+
+    ct_ratio = df["CT ratio"].where(df["CT ratio"].str.startswith("("), "(" + df["CT ratio"] + ")")
+    fail(~ct_ratio.isin(CT_RATIOS), "CT ratio not in " + "/".join(CT_RATIOS))
+
+    off, off_hour, off_minute, off_ampm = parse_times(df["Off time"])
+    on, on_hour, on_minute, on_ampm = parse_times(df["On time"])
+    fail(off.isna(), "off time must be HH:MM AM/PM")
+    fail(on.isna(), "on time must be HH:MM AM/PM")
+    fail(off.notna() & on.notna() & np.isnan(outage_durations(off, on)),
+         f"on time must be after off time (next day: within {MAX_OUTAGE_MINUTES // 60} hours)")
+
+    dates = parse_dates(df["Date"])
+    fail(dates.isna(), "date must be DD-MM-YYYY")
+
+    fail(df["Officer name"] == "", "officer name missing")
+    fail(~df["Mobile number"].str.fullmatch(r"\d{10}"), "mobile number must be 10 digits")
+
+    date_text = dates.dt.strftime("%d-%m-%Y")
+    keys = pd.DataFrame({"dtr_code": df["Dtr code"], "msn": df["Msn"], "date": date_text})
+    if within is not None:
+        keys["group"] = within
+    fail(keys.duplicated(keep="first"), "repeated in this submission")
+
+    records = pd.DataFrame({
+        "region": paths["Region"],
+        "circle": paths["Circle"],
+        "division": paths["Division"],
+        "substation": paths["Sub station"],
+        "feeder": paths["Feeder"],
+        "dtr": paths["Dtr"],
+        "dtr_code": df["Dtr code"],
+        "feeder_code": paths["Feeder code"],
+        # an MSN the master doesn't know for this DTR is kept as a new
+        # serial with no MDM one: a sheet row doesn't say which of the
+        # DTR's meters it replaces, so only the form's explicit "नहीं,
+        # बदलना है" answers become MSN corrections
+        "msn_auto": np.where(known, df["Msn"], ""),
+        "new_msn": np.where(known, "", df["Msn"]),
+        "final_msn": df["Msn"],
+        "dtr_off_time": format_times(off_hour, off_minute, off_ampm),
+        "dtr_on_time": format_times(on_hour, on_minute, on_ampm),
+        "date": date_text,
+        "ae_je_name": df["Officer name"],
+        "mobile_number": df["Mobile number"],
+        "application_number": "",
+        "ct_ratio": ct_ratio,
+    }, index=df.index)
+
+    report = df.copy()
+    report.insert(0, "Row", np.arange(2, n + 2))  # spreadsheet row, after the header
+    report["Errors"] = errors.str.rstrip("; ")
+    valid = errors == ""
+    return records[valid], report
+
+
+def submit_records(records, allocator, submitted_keys, record_store):
+    # Claims each (Dtr code, MSN, date) key, numbers the survivors in one
+    # allocator transaction and commits them to the store in one batch.
+    keys = list(records[["dtr_code", "final_msn", "date"]].itertuples(index=False, name=None))
+    claimed = np.asarray(submitted_keys.claim_many(keys), dtype=bool)
+    fresh = records[claimed].copy()
+    duplicates = records.index[~claimed]
+
+    try:
+        fresh["application_number"] = allocator.next_numbers(len(fresh))
+        record_store.add_many(fresh[RECORD_COLUMNS].values.tolist())
+    except Exception:
+        # nothing was stored: free the keys so the rows can be sent again
+        submitted_keys.release_many([key for key, won in zip(keys, claimed) if won])
+        raise
+    submitted_keys.assign_many(
+        fresh[["dtr_code", "final_msn", "date", "application_number"]].itertuples(index=False, name=None)
+    )
+    return fresh, duplicates
@@ -0,0 +1,54 @@
+import os
+
+# ----------------- LOCAL STORAGE -----------------
+# Everything the portal keeps on disk (sequence counters, queues, caches)
+# lives under one directory so a deployment only has to persist that path.
+DATA_DIR = os.environ.get("DTR_DATA_DIR", "data")
+
+
+def data_path(*parts):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return os.path.join(DATA_DIR, *parts)
+
+
+# ----------------- SHEETS BACKEND -----------------
+# "google" talks to the DTR_Indexation_Records spreadsheet; "local" uses
+# the in-process LocalWorksheet stand-in (offline runs, tests, benchmarks).
+SHEETS_BACKEND = os.environ.get("DTR_SHEETS_BACKEND", "google")
+
+
+# ----------------- OBSERVABILITY -----------------
+# Prometheus text metrics are served on 127.0.0.1:<port> (0 disables), and
+# hot-path timings can also be written as JSON lines to a log file.
+METRICS_PORT = int(os.environ.get("DTR_METRICS_PORT", "9464"))
+TIMING_LOG = os.environ.get("DTR_TIMING_LOG", "")
+
+
+# ----------------- MASTER RELOAD -----------------
+# How often the running portal checks the master batches (and the shared
+# snapshot) for a newer version to swap in.
+MASTER_POLL_SECONDS = float(os.environ.get("DTR_MASTER_POLL_SECONDS", "30"))
+# Region partitions of the master a process keeps mapped at once
+MASTER_REGION_CACHE = int(os.environ.get("DTR_MASTER_REGION_CACHE", "4"))
+# Partitions of an older MSN overlay stay on disk this long after a newer
+# one replaced them: sessions (and other workers) still holding the older
+# bundle map its Regions and search index lazily, from those files.
+MASTER_RETAIN_MINUTES = float(os.environ.get("DTR_MASTER_RETAIN_MINUTES", "120"))
+
+
+# ----------------- IDLE SESSIONS -----------------
+# An open tab left untouched this long has its form state (and any
+# uploaded file) dropped on the server; 0 keeps sessions until the tab
+# closes. Closed tabs are reaped by Streamlit's server.disconnectedSessionTTL.
+SESSION_IDLE_MINUTES = float(os.environ.get("DTR_SESSION_IDLE_MINUTES", "30"))
+
+
+# ----------------- SUBMISSION API -----------------
+# The JSON API (api.py) listens beside the portal; local-only by default,
+# put a reverse proxy with TLS in front to open it to field apps.
+API_HOST = os.environ.get("DTR_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("DTR_API_PORT", "8600"))
+# The API's address as the officers' browsers reach it (through that
+# proxy), e.g. https://dtr.example.org; the Export page links its
+# streamed downloads there. Empty: exports go through Streamlit only.
+API_PUBLIC_URL = os.environ.get("DTR_API_URL", "").rstrip("/")
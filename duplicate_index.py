@@ -0,0 +1,102 @@
+import sqlite3
+import threading
+import time
+
+from config import data_path
+from sheets import RECORD_COLUMNS, fetch_rows_after
+
+# ----------------- SUBMITTED KEY INDEX -----------------
+# Local set of (Dtr code, final MSN, date) keys that were already indexed,
+# so the submit path can refuse a duplicate with one primary-key lookup.
+# It is fed from two sides: every local submission, and an incremental
+# read of the records sheet that only fetches rows past the last offset
+# (SheetSync runs it in the background; the submit path only claims).
+DTR_CODE = RECORD_COLUMNS.index("dtr_code")
+FINAL_MSN = RECORD_COLUMNS.index("final_msn")
+DATE = RECORD_COLUMNS.index("date")
+APPLICATION_NUMBER = RECORD_COLUMNS.index("application_number")
+
+
+class SubmittedKeyIndex:
+    def __init__(self, path=None, sync_interval=30.0):
+        self.path = path or data_path("submitted_keys.db")
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submitted_keys ("
+                " dtr_code TEXT NOT NULL,"
+                " msn TEXT NOT NULL,"
+                " date TEXT NOT NULL,"
+                " application_number TEXT,"
+                " PRIMARY KEY (dtr_code, msn, date))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sheet_offset (id INTEGER PRIMARY KEY CHECK (id = 0), rows INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO sheet_offset (id, rows) VALUES (0, 0)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def claim(self, dtr_code, msn, date):
+        return self.claim_many([(dtr_code, msn, date)])[0]
+
+    def claim_many(self, keys):
+        # Atomic check-and-insert per key: False where the key was already
+        # indexed, so two officers submitting the same DTR cannot both win
+        with self._connect() as conn:
+            return [
+                conn.execute(
+                    "INSERT OR IGNORE INTO submitted_keys (dtr_code, msn, date) VALUES (?, ?, ?)",
+                    (str(dtr_code), str(msn), date)
+                ).rowcount == 1
+                for dtr_code, msn, date in keys
+            ]
+
+    def assign(self, dtr_code, msn, date, application_number):
+        self.assign_many([(dtr_code, msn, date, application_number)])
+
+    def assign_many(self, keys):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE submitted_keys SET application_number = ? WHERE dtr_code = ? AND msn = ? AND date = ?",
+                [(number, str(dtr_code), str(msn), date) for dtr_code, msn, date, number in keys]
+            )
+
+    def release(self, dtr_code, msn, date):
+        self.release_many([(dtr_code, msn, date)])
+
+    def release_many(self, keys):
+        # undoes claim_many() for keys whose records were never stored
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM submitted_keys WHERE dtr_code = ? AND msn = ? AND date = ?",
+                [(str(dtr_code), str(msn), date) for dtr_code, msn, date in keys]
+            )
+
+    def synced_rows(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT rows FROM sheet_offset").fetchone()[0]
+
+    def sync_from_sheet(self, sheet):
+        with self._lock:
+            # a failed read waits out the interval too, not retried per call
+            self._last_sync = time.monotonic()
+            offset = self.synced_rows()
+            rows = fetch_rows_after(sheet, offset)
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO submitted_keys VALUES (?, ?, ?, ?)",
+                    [(row[DTR_CODE], row[FINAL_MSN], row[DATE], row[APPLICATION_NUMBER])
+                     for row in rows if row[DTR_CODE] and row[FINAL_MSN]]
+                )
+                conn.execute("UPDATE sheet_offset SET rows = ?", (offset + len(rows),))
+            return len(rows)
+
+    def sync_if_stale(self, sheet):
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            return self.sync_from_sheet(sheet)
+        return 0
@@ -0,0 +1,258 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# ----------------- HIERARCHY INDEX -----------------
+# Region -> Circle -> Division -> Sub station -> Feeder -> Dtr, keyed on the
+# full path so two DTRs with the same name on different feeders never mix.
+#
+# The index is a flat set of NumPy arrays rather than nested dicts, so it
+# can be saved beside a snapshot and memory-mapped read-only by every
+# worker process (save_index / load_index):
+#   values.<i>       sorted distinct strings of INDEX_COLUMNS[i]; a value's
+#                    code is its position, so code order is string order
+#   path.<i>         one row of codes per distinct path, sorted, so every
+#                    prefix is a contiguous range found by bisection
+#   path_rank        first-seen position of each path; dropdowns list the
+#                    children in the order the master file has them
+#   msn_dtr/msn/msn_path   the (Dtr code, Msn) pairs, grouped by Dtr code
+#   search_*         see SEARCH INDEX below
+HIERARCHY_LEVELS = ["Region", "Circle", "Division", "Sub station", "Feeder", "Dtr"]
+CODE_COLUMNS = ["Feeder code", "Dtr code"]
+PATH_COLUMNS = HIERARCHY_LEVELS + CODE_COLUMNS
+INDEX_COLUMNS = PATH_COLUMNS + ["Msn"]
+DTR_CODE = PATH_COLUMNS.index("Dtr code")
+MSN = INDEX_COLUMNS.index("Msn")
+
+
+def _encode(column):
+    # strings -> (sorted distinct values, int32 code per row, -1 for missing)
+    present = column.notna().to_numpy()
+    text = column[present].astype(str).to_numpy(dtype=str)
+    values = np.unique(text)
+    codes = np.full(len(column), -1, dtype=np.int32)
+    codes[present] = np.searchsorted(values, text)
+    return values, codes
+
+
+def _distinct(codes, rank):
+    # distinct codes, ordered by where each first appears
+    codes = codes[np.argsort(rank, kind="stable")]
+    _, first = np.unique(codes, return_index=True)
+    return codes[np.sort(first)]
+
+
+def build_hierarchy_index(df, search=True):
+    import pandas as pd
+
+    rows = df[INDEX_COLUMNS].dropna(subset=PATH_COLUMNS)
+    index = {}
+    codes = {}
+    for i, column in enumerate(INDEX_COLUMNS):
+        index[f"values.{i}"], codes[i] = _encode(rows[column])
+
+    # distinct paths, first-seen rank, then sorted by code
+    path_codes = pd.DataFrame({i: codes[i] for i in range(len(PATH_COLUMNS))})
+    distinct = path_codes.drop_duplicates(ignore_index=True)
+    order = np.lexsort([distinct[i].to_numpy() for i in reversed(range(len(PATH_COLUMNS)))])
+    for i in range(len(PATH_COLUMNS)):
+        index[f"path.{i}"] = distinct[i].to_numpy()[order]
+    index["path_rank"] = order.astype(np.int32)
+
+    # each row's sorted path position, for the MSN pairs
+    position = np.empty(len(order), dtype=np.int32)
+    position[order] = np.arange(len(order), dtype=np.int32)
+    path_of_row = path_codes.merge(
+        distinct.assign(path=position), on=list(range(len(PATH_COLUMNS))), how="left"
+    )["path"].to_numpy()
+
+    pairs = pd.DataFrame({
+        "dtr": codes[DTR_CODE], "msn": codes[MSN], "path": path_of_row,
+        "rank": np.arange(len(rows)),
+    })
+    pairs = pairs[pairs["msn"] >= 0].drop_duplicates(["path", "msn"])
+    pairs = pairs.sort_values(["dtr", "rank"], kind="stable")
+    index["msn_dtr"] = pairs["dtr"].to_numpy(dtype=np.int32)
+    index["msn"] = pairs["msn"].to_numpy(dtype=np.int32)
+    index["msn_path"] = pairs["path"].to_numpy(dtype=np.int32)
+
+    if search:
+        index.update(_build_search(index))
+    return index
+
+
+def save_index(index, directory):
+    # written aside and renamed into place, so concurrent builders are safe
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(prefix=".index-", dir=parent)
+    for name, array in index.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), array)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        shutil.rmtree(tmp_dir)  # another process got there first
+
+
+def load_index(directory):
+    return {
+        name[:-len(".npy")]: np.load(os.path.join(directory, name), mmap_mode="r")
+        for name in os.listdir(directory) if name.endswith(".npy")
+    }
+
+
+def _code(index, column, value):
+    if value is None:
+        return None
+    values = index[f"values.{column}"]
+    value = str(value)
+    position = int(np.searchsorted(values, value))
+    if position < len(values) and values[position] == value:
+        return position
+    return None
+
+
+def _path_range(index, path):
+    lo, hi = 0, len(index["path_rank"])
+    for level, value in enumerate(path):
+        code = _code(index, level, value) if level < len(PATH_COLUMNS) else None
+        if code is None:
+            return 0, 0
+        column = index[f"path.{level}"][lo:hi]
+        lo, hi = lo + int(np.searchsorted(column, code, "left")), lo + int(np.searchsorted(column, code, "right"))
+    return lo, hi
+
+
+def _column_under(index, column, path):
+    if column >= len(PATH_COLUMNS):
+        return []
+    lo, hi = _path_range(index, path)
+    if lo == hi:
+        return []
+    codes, rank = index[f"path.{column}"][lo:hi], index["path_rank"][lo:hi]
+    if column == len(path):
+        # the next level is itself sorted inside the range: one group per
+        # child, listed by the earliest rank in each group
+        starts = np.flatnonzero(np.diff(codes, prepend=-1))
+        codes = codes[starts][np.argsort(np.minimum.reduceat(rank, starts), kind="stable")]
+    else:
+        codes = _distinct(codes, rank)
+    return index[f"values.{column}"][codes].tolist()
+
+
+def hierarchy_children(index, *path):
+    return _column_under(index, len(path), path)
+
+
+def dtr_codes(index, *path):
+    return _column_under(index, DTR_CODE, path)
+
+
+def feeder_codes(index, *path):
+    return _column_under(index, PATH_COLUMNS.index("Feeder code"), path)
+
+
+def path_id(index, *path):
+    # a complete path (all PATH_COLUMNS) -> its row in the sorted path
+    # arrays, a small int that stands for the whole selection
+    if len(path) != len(PATH_COLUMNS):
+        return None
+    lo, hi = _path_range(index, path)
+    return lo if hi > lo else None
+
+
+def path_values(index, path_id):
+    return {
+        column: str(index[f"values.{i}"][index[f"path.{i}"][path_id]])
+        for i, column in enumerate(PATH_COLUMNS)
+    }
+
+
+def dtr_msns(index, dtr_code):
+    code = _code(index, DTR_CODE, dtr_code)
+    if code is None:
+        return []
+    dtrs = index["msn_dtr"]
+    lo, hi = int(np.searchsorted(dtrs, code, "left")), int(np.searchsorted(dtrs, code, "right"))
+    codes = index["msn"][lo:hi]
+    return index[f"values.{MSN}"][_distinct(codes, np.arange(len(codes)))].tolist()
+
+
+# ----------------- SEARCH INDEX -----------------
+# Sorted keys over Msn / Dtr code / Feeder code, so an exact or prefix
+# (typeahead) lookup is one bisection into one array. Each hit carries the
+# hierarchy path it resolves to, down to the level the field identifies:
+# search_ref points at an MSN pair for "Msn" and at a path otherwise.
+SEARCH_FIELDS = {
+    "Msn": HIERARCHY_LEVELS + CODE_COLUMNS + ["Msn"],
+    "Dtr code": HIERARCHY_LEVELS + CODE_COLUMNS,
+    "Feeder code": HIERARCHY_LEVELS[:5] + ["Feeder code"],
+}
+SEARCH_FIELD_NAMES = sorted(SEARCH_FIELDS)
+
+
+def normalize_search_key(value):
+    return str(value).strip().upper()
+
+
+def _build_search(index):
+    import pandas as pd
+
+    paths = pd.DataFrame({i: index[f"path.{i}"] for i in range(len(PATH_COLUMNS))})
+    entries = []
+    for field, columns in SEARCH_FIELDS.items():
+        positions = [INDEX_COLUMNS.index(column) for column in columns]
+        if field == "Msn":
+            refs = np.arange(len(index["msn"]))
+            found = paths.iloc[index["msn_path"]].reset_index(drop=True)
+            found[MSN] = index["msn"]
+        else:
+            refs = np.arange(len(paths))
+            found = paths.copy()
+        found = found[positions].copy()
+        found["ref"] = refs
+        found = found.drop_duplicates(positions)
+        # sort on the path that identifies the hit, padded to equal width
+        entry = pd.DataFrame({
+            "key": pd.Series(index[f"values.{positions[-1]}"][found[positions[-1]].to_numpy()]).str.strip().str.upper(),
+            "field": SEARCH_FIELD_NAMES.index(field),
+            "ref": found["ref"].to_numpy(),
+        })
+        for slot, position in enumerate(positions):
+            entry[f"c{slot}"] = found[position].to_numpy()
+        entries.append(entry)
+
+    entries = pd.concat(entries, ignore_index=True).fillna(-1)
+    entries = entries.sort_values(["key", "field"] + [f"c{slot}" for slot in range(len(INDEX_COLUMNS))])
+    return {
+        "search_keys": entries["key"].to_numpy(dtype=str),
+        "search_field": entries["field"].to_numpy(dtype=np.int8),
+        "search_ref": entries["ref"].to_numpy(dtype=np.int32),
+    }
+
+
+def search_master(search_index, query, limit=20):
+    prefix = normalize_search_key(query)
+    keys = search_index["search_keys"]
+    if not prefix or len(prefix) > keys.dtype.itemsize // 4:
+        return []
+    start = int(np.searchsorted(keys, prefix))
+    count = int(np.char.startswith(keys[start:start + limit], prefix).sum())
+    fields = search_index["search_field"][start:start + count]
+    refs = search_index["search_ref"][start:start + count]
+
+    # gather each column once for all hits, then assemble the dicts
+    is_msn = fields == SEARCH_FIELD_NAMES.index("Msn")
+    paths = np.where(is_msn, search_index["msn_path"][np.where(is_msn, refs, 0)], refs)
+    msns = search_index["msn"][np.where(is_msn, refs, 0)]
+    columns = {
+        column: search_index[f"values.{i}"][msns if i == MSN else search_index[f"path.{i}"][paths]].tolist()
+        for i, column in enumerate(INDEX_COLUMNS)
+    }
+    hits = []
+    for n, field in enumerate(fields.tolist()):
+        field = SEARCH_FIELD_NAMES[field]
+        hit = {column: columns[column][n] for column in SEARCH_FIELDS[field]}
+        hits.append(dict(hit, field=field, value=hit[field]))
+    return hits
@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+
+from benchmarks.bench_common import run_script_once, wait_healthy
+from master_reload import MasterReloader
+
+# ----------------- MULTI-WORKER LAUNCHER -----------------
+# Runs N Streamlit processes of the portal on consecutive ports, for a load
+# balancer with sticky sessions (Streamlit keeps each session on one
+# websocket) to spread officers over:
+#
+#     python launch_workers.py --workers 4 --port 8501
+#
+# The master snapshot and its index are published once, before any worker
+# starts. Every worker then memory-maps the same read-only files under
+# DTR_DATA_DIR/master_snapshot, so the master costs one copy in the page
+# cache however many workers run. After start-up each worker is sent one
+# script run over its websocket, and the launcher reads /proc/<pid>/smaps
+# to confirm the workers really share those pages. Ctrl-C stops them all.
+
+
+def snapshot_mappings(pid, cache_dir):
+    # MB of snapshot files mapped by a process: resident, and its
+    # proportional share (PSS splits every page over the processes using it)
+    prefix = os.path.abspath(cache_dir)
+    totals = {"Rss": 0, "Pss": 0, "Shared_Clean": 0}
+    inside = False
+    with open(f"/proc/{pid}/smaps", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and not fields[0].endswith(":"):
+                inside = len(fields) >= 6 and fields[5].startswith(prefix)
+            elif inside and fields[0].rstrip(":") in totals:
+                totals[fields[0].rstrip(":")] += int(fields[1])
+    return {name: kb / 1024 for name, kb in totals.items()}
+
+
+def warm_up(port, process, timeout=120):
+    # one full script run, so the worker loads the master like a visitor would
+    try:
+        wait_healthy(port, 60, process, interval=0.5)
+        asyncio.run(run_script_once(port, timeout))
+        return True
+    except Exception as e:
+        print(f"  worker on port {port}: warm-up failed: {e}")
+        return False
+
+
+def verify_sharing(workers, cache_dir):
+    if not os.path.exists("/proc/self/smaps"):
+        print("Page sharing check needs /proc (Linux); skipped.")
+        return None
+    rows = [(port, process.pid, snapshot_mappings(process.pid, cache_dir)) for port, process in workers]
+    for port, pid, mapped in rows:
+        print(f"  port {port} pid {pid}: {mapped['Rss']:.1f} MB of snapshot pages resident, "
+              f"{mapped['Shared_Clean']:.1f} MB shared, PSS {mapped['Pss']:.1f} MB")
+    resident = max(mapped["Rss"] for _, _, mapped in rows)
+    counted = sum(mapped["Pss"] for _, _, mapped in rows)
+    shared = len(rows) > 1 and all(mapped["Shared_Clean"] > 0 for _, _, mapped in rows)
+    print(f"{len(rows)} workers map {resident:.1f} MB of master data; counted once that is "
+          f"{counted:.1f} MB in total -> {'shared' if shared else 'NOT shared'}")
+    return shared
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several portal workers sharing one master snapshot")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--port", type=int, default=8501, help="first worker's port")
+    parser.add_argument("--metrics-port", type=int, default=9464, help="first worker's metrics port (0 disables)")
+    parser.add_argument("--no-verify", action="store_true", help="skip the warm-up and sharing check")
+    args = parser.parse_args()
+
+    reloader = MasterReloader()
+    reloader.check()  # republishes first if a batch changed
+    manifest = reloader.current["manifest"]
+    print(f"Master snapshot {manifest['version']} ready ({manifest['rows']} records)")
+
+    app = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    workers = []
+    for i in range(args.workers):
+        port = args.port + i
+        env = dict(os.environ, DTR_METRICS_PORT=str(args.metrics_port + i if args.metrics_port else 0))
+        process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", app,
+             "--server.port", str(port), "--server.headless", "true"],
+            env=env
+        )
+        workers.append((port, process))
+    print(f"Started {len(workers)} workers on ports {args.port}-{args.port + len(workers) - 1}")
+
+    # a service manager's SIGTERM stops the workers too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        if not args.no_verify:
+            for port, process in workers:
+                if not warm_up(port, process):
+                    print(f"  worker on port {port} did not finish a script run")
+            verify_sharing(workers, reloader.cache_dir)
+        for _, process in workers:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for _, process in workers:
+            process.terminate()
+        for _, process in workers:
+            process.wait()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+# ----------------- COLUMNAR MASTER CACHE -----------------
+# The merged master (master_ingest.py) is written once into one directory
+# per source version: every column becomes a categorical, stored as an int
+# codes .npy (memory-mapped on load, so Streamlit workers share the pages)
+# and a small categories .npy. A "current.json" pointer names the live
+# version together with the size/mtime/sha256 of the sources it was
+# built from.
+MANIFEST = "current.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def source_fingerprint(paths):
+    sources = []
+    for path in paths:
+        stat = os.stat(path)
+        sources.append({
+            "name": os.path.basename(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": file_sha256(path),
+        })
+    return sources
+
+
+def is_fresh(manifest, source_paths):
+    if manifest is None or len(manifest["sources"]) != len(source_paths):
+        return False
+    for source, path in zip(manifest["sources"], source_paths):
+        stat = os.stat(path)
+        if source["name"] != os.path.basename(path) or source["size"] != stat.st_size:
+            return False
+        # a touched but unchanged file (copied, re-checked out, ...) is still fresh
+        if source["mtime"] != stat.st_mtime and source["sha256"] != file_sha256(path):
+            return False
+    return True
+
+
+def compact_column(values):
+    # every master column is text; as a categorical it is an int8/16/32
+    # code per row plus one shared table of the distinct strings
+    import pandas as pd
+
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    return values.astype("string").astype("category")
+
+
+def compact_frame(df):
+    import pandas as pd
+
+    return pd.DataFrame({name: compact_column(df[name]) for name in df.columns}, copy=False)
+
+
+def write_columns(df, cache_dir, sources, **extra):
+    # Writes df into a fresh version directory and flips the pointer to it;
+    # readers still holding the previous version's mmaps are unaffected.
+    os.makedirs(cache_dir, exist_ok=True)
+    version = hashlib.sha256(
+        "".join(source["sha256"] for source in sources).encode()
+    ).hexdigest()[:16]
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=cache_dir)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        values = compact_column(df[name])
+        np.save(os.path.join(tmp_dir, f"{i}.codes.npy"), values.cat.codes.to_numpy())
+        np.save(os.path.join(tmp_dir, f"{i}.categories.npy"),
+                np.asarray(values.cat.categories.astype(str), dtype=str))
+        columns.append(name)
+
+    version_dir = os.path.join(cache_dir, version)
+    if os.path.isdir(version_dir):
+        shutil.rmtree(tmp_dir)
+    else:
+        os.replace(tmp_dir, version_dir)
+
+    manifest = {
+        "version": version,
+        "columns": columns,
+        "rows": int(len(df)),
+        "published_at": datetime.now().isoformat(timespec="seconds"),
+        "sources": sources,
+        **extra,
+    }
+    fd, tmp_manifest = tempfile.mkstemp(prefix=".manifest-", dir=cache_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_manifest, os.path.join(cache_dir, MANIFEST))
+    return manifest
+
+
+def read_master_cache(cache_dir, manifest=None):
+    import pandas as pd
+
+    manifest = manifest or read_manifest(cache_dir)
+    version_dir = os.path.join(cache_dir, manifest["version"])
+    columns = {}
+    for i, name in enumerate(manifest["columns"]):
+        codes = np.load(os.path.join(version_dir, f"{i}.codes.npy"), mmap_mode="r")
+        categories = np.load(os.path.join(version_dir, f"{i}.categories.npy"))
+        columns[name] = pd.Categorical.from_codes(codes, categories=categories.tolist())
+    # copy=False keeps the codes on the memory-mapped pages
+    return pd.DataFrame(columns, copy=False)
+
@@ -0,0 +1,223 @@
+import glob
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+from config import data_path
+from metrics import timed_function
+from master_cache import compact_frame, is_fresh, read_manifest, read_master_cache, source_fingerprint, write_columns
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process publish lock
+    fcntl = None
+
+# ----------------- MASTER INGESTION -----------------
+# All "DTR Master Information*.xlsx" batches are merged into one snapshot.
+# Batches are read in parallel worker processes with openpyxl's streaming
+# reader, and folded oldest -> newest so a (Dtr code, Msn) that appears in
+# several batches keeps the newest batch's row. That order comes from
+# master_batches.txt beside the workbooks (one file name per line, oldest
+# first): neither the names nor the mtimes of a checkout say it.
+# Disagreements between batches on the hierarchy fields are reported as
+# conflicts.
+MASTER_PATTERN = "DTR Master Information*.xlsx"
+BATCH_ORDER_FILE = "master_batches.txt"
+DEDUP_KEY = ["Dtr code", "Msn"]
+CONFLICT_COLUMNS = ["Region", "Circle", "Division", "Sub station", "Feeder", "Dtr", "Feeder code"]
+FOOTER_PREFIX = "Total Number of record(s) found"
+
+
+def read_batch_order(directory="."):
+    # file names from master_batches.txt, oldest first; None without one
+    try:
+        with open(os.path.join(directory, BATCH_ORDER_FILE), encoding="utf-8") as f:
+            lines = [line.strip() for line in f]
+    except FileNotFoundError:
+        return None
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+def discover_batches(directory="."):
+    # oldest first, as listed in master_batches.txt; a lone batch needs no
+    # list, and a batch missing from it (or listed but absent) is an error
+    # rather than a guess at where it belongs
+    found = {os.path.basename(path) for path in glob.glob(os.path.join(directory, MASTER_PATTERN))}
+    order = read_batch_order(directory)
+    if order is None:
+        if len(found) > 1:
+            raise ValueError(f"{len(found)} master batches but no {BATCH_ORDER_FILE} to order them")
+        order = sorted(found)
+    if len(set(order)) != len(order):
+        raise ValueError(f"{BATCH_ORDER_FILE} lists a batch more than once")
+    unlisted = sorted(found - set(order))
+    if unlisted:
+        raise ValueError(f"Master batches not in {BATCH_ORDER_FILE}: {', '.join(unlisted)}")
+    missing = [name for name in order if name not in found]
+    if missing:
+        raise FileNotFoundError(f"Master batches in {BATCH_ORDER_FILE} not found: {', '.join(missing)}")
+    return [os.path.join(directory, name) for name in order]
+
+
+def snapshot_dir():
+    return data_path("master_snapshot")
+
+
+def _cell(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_batch(path):
+    # Streams the sheet row by row; only the compact, de-duplicated
+    # categorical frame travels back to the parent process.
+    import openpyxl
+    import pandas as pd
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = [_cell(name) for name in next(rows)]
+        records = []
+        for row in rows:
+            if row[0] is None and not any(row):
+                continue
+            if isinstance(row[0], str) and row[0].startswith(FOOTER_PREFIX):
+                continue
+            records.append([_cell(value) for value in row])
+    finally:
+        wb.close()
+
+    df = pd.DataFrame(records, columns=header).drop(columns=["SL.No"], errors="ignore")
+    df = df.dropna(subset=["Dtr code"])
+    df = df.drop_duplicates(subset=DEDUP_KEY, keep="last")
+    return df.astype("category")
+
+
+def _conflicts(merged, batch, batch_name):
+    both = merged.merge(batch, on=DEDUP_KEY, suffixes=("_old", "_new"))
+    found = []
+    for column in CONFLICT_COLUMNS:
+        old = both[f"{column}_old"].astype(object)
+        new = both[f"{column}_new"].astype(object)
+        differs = old.ne(new) & ~(old.isna() & new.isna())
+        if differs.any():
+            rows = both.loc[differs, DEDUP_KEY + ["Batch_old"]].astype(object)
+            rows["column"] = column
+            rows["old"] = old[differs]
+            rows["new"] = new[differs]
+            rows["Batch_new"] = batch_name
+            found.append(rows)
+    return found
+
+
+def merge_batches(paths, workers=None):
+    import pandas as pd
+
+    if not paths:
+        raise FileNotFoundError(f"No master batches matching '{MASTER_PATTERN}'")
+    merged = None
+    conflicts = []
+    workers = workers or os.cpu_count() or 1
+    remaining = iter(paths)
+    # spawned, not forked: the reloader publishes from a thread of a running
+    # server, and a forked child would inherit its locks and threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        # Only `workers` batches are submitted ahead of the merge, and the
+        # next one as each is taken, so memory holds the running merge plus
+        # at most that many read batches however many there are.
+        window = deque((path, executor.submit(read_batch, path)) for path in islice(remaining, workers))
+        while window:
+            path, future = window.popleft()
+            batch = future.result()
+            for following in islice(remaining, 1):
+                window.append((following, executor.submit(read_batch, following)))
+            name = os.path.basename(path)
+            batch["Batch"] = pd.Categorical([name] * len(batch))
+            if merged is None:
+                merged = batch
+                continue
+            conflicts.extend(_conflicts(merged, batch, name))
+            merged = pd.concat([merged, batch], ignore_index=True)
+            merged = merged.drop_duplicates(subset=DEDUP_KEY, keep="last")
+
+    merged = compact_frame(merged.reset_index(drop=True).astype("string"))
+    conflicts = pd.concat(conflicts, ignore_index=True) if conflicts else pd.DataFrame(
+        columns=DEDUP_KEY + ["Batch_old", "column", "old", "new", "Batch_new"]
+    )
+    return merged, conflicts
+
+
+@contextmanager
+def publish_lock(cache_dir):
+    # Every portal worker watches the batches; when one changes they all
+    # see it, and publishes take turns so only one of them parses it.
+    if getattr(multiprocessing.current_process(), "_inheriting", False):
+        # A spawned merge worker re-imports the parent's main module (app.py
+        # under `streamlit run`) before it starts; waiting here on the lock
+        # its parent holds would never end.
+        raise RuntimeError("the master snapshot is published by the parent process")
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(os.path.join(cache_dir, ".publish-lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def publish_snapshot(paths=None, cache_dir=None, workers=None):
+    paths = paths or discover_batches()
+    cache_dir = cache_dir or snapshot_dir()
+    with publish_lock(cache_dir):
+        return _publish(paths, cache_dir, workers)
+
+
+def refresh_snapshot(paths=None, cache_dir=None):
+    # The current manifest, publishing a new snapshot first if a batch has
+    # changed since; a worker that waited on the lock finds it done.
+    paths = paths or discover_batches()
+    cache_dir = cache_dir or snapshot_dir()
+    manifest = read_manifest(cache_dir)
+    if is_fresh(manifest, paths):
+        return manifest
+    with publish_lock(cache_dir):
+        manifest = read_manifest(cache_dir)
+        if not is_fresh(manifest, paths):
+            manifest = _publish(paths, cache_dir)
+        return manifest
+
+
+@timed_function("dtr_master_publish_seconds")
+def _publish(paths, cache_dir, workers=None):
+    merged, conflicts = merge_batches(paths, workers)
+
+    manifest = write_columns(
+        merged, cache_dir, source_fingerprint(paths), conflicts=int(len(conflicts))
+    )
+    conflicts.to_csv(
+        os.path.join(cache_dir, manifest["version"], "conflicts.csv"), index=False
+    )
+    return manifest
+
+
+@timed_function("dtr_master_load_seconds")
+def load_snapshot(paths=None, cache_dir=None):
+    paths = paths or discover_batches()
+    cache_dir = cache_dir or snapshot_dir()
+    manifest = refresh_snapshot(paths, cache_dir)
+    return read_master_cache(cache_dir, manifest), manifest
+
+
+if __name__ == "__main__":
+    # python master_ingest.py [oldest.xlsx ... newest.xlsx]
+    published = publish_snapshot(sys.argv[1:] or None)
+    print(f"snapshot {published['version']}: {published['rows']} records "
+          f"from {len(published['sources'])} batches, {published['conflicts']} conflicts")
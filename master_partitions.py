@@ -0,0 +1,98 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+from hierarchy import build_hierarchy_index, hierarchy_children, load_index, save_index
+from metrics import inc, timed
+
+# ----------------- REGION PARTITIONS -----------------
+# The hierarchy index is saved once per Region beside the snapshot, plus
+# one state-wide index that only the quick search reads, and a small
+# regions.json listing them:
+#   <dir>/regions.json   region names (in master order) -> partition dir
+#   <dir>/region.<i>/    hierarchy index of one Region's rows
+#   <dir>/all/           state-wide index with the search arrays
+# A process starts from regions.json alone. A Region's partition is mapped
+# the first time that Region is picked and kept in a small LRU cache; the
+# search index and the bulk upload's lookup are loaded on first use, so
+# start-up and resident memory follow the Regions officers actually work in.
+PARTITIONS_FILE = "regions.json"
+
+
+def save_partitions(df, directory):
+    # built aside and renamed into place, like save_index
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp_dir = tempfile.mkdtemp(prefix=".partitions-", dir=parent)
+    state = build_hierarchy_index(df)
+    save_index(state, os.path.join(tmp_dir, "all"))
+    regions = []
+    for i, region in enumerate(hierarchy_children(state)):
+        rows = df[df["Region"] == region]
+        save_index(build_hierarchy_index(rows, search=False), os.path.join(tmp_dir, f"region.{i}"))
+        regions.append({"name": region, "dir": f"region.{i}", "rows": int(len(rows))})
+    with open(os.path.join(tmp_dir, PARTITIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"regions": regions}, f, ensure_ascii=False, indent=2)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        shutil.rmtree(tmp_dir)  # another process got there first
+
+
+class MasterPartitions:
+    def __init__(self, directory, load_frame, capacity=4):
+        self.directory = directory
+        self.load_frame = load_frame  # -> the master frame, for the bulk lookup
+        self.capacity = capacity
+        with open(os.path.join(directory, PARTITIONS_FILE), encoding="utf-8") as f:
+            regions = json.load(f)["regions"]
+        self.regions = [region["name"] for region in regions]
+        self._dirs = {region["name"]: region["dir"] for region in regions}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._search = None
+        self._lookup = None
+
+    def region(self, name):
+        # the Region's index; None for a Region the master doesn't have
+        with self._lock:
+            index = self._cache.get(name)
+            if index is not None:
+                self._cache.move_to_end(name)
+                return index
+        if name not in self._dirs:
+            return None
+        with timed("dtr_master_partition_load_seconds"):
+            index = load_index(os.path.join(self.directory, self._dirs[name]))
+        inc("dtr_master_partition_loads_total")
+        with self._lock:
+            self._cache[name] = index
+            self._cache.move_to_end(name)
+            while len(self._cache) > self.capacity:
+                # sessions still holding the index keep it until they rerun
+                self._cache.popitem(last=False)
+                inc("dtr_master_partition_evictions_total")
+        return index
+
+    def children(self, *path):
+        # hierarchy_children() over the partitions; the Regions themselves
+        # come from regions.json
+        if not path:
+            return list(self.regions)
+        index = self.region(path[0])
+        return [] if index is None else hierarchy_children(index, *path)
+
+    def search_index(self):
+        if self._search is None:
+            self._search = load_index(os.path.join(self.directory, "all"))
+        return self._search
+
+    def lookup(self):
+        from bulk_upload import build_master_lookup  # pandas, on first use
+
+        with self._lock:
+            if self._lookup is None:
+                self._lookup = build_master_lookup(self.load_frame())
+            return self._lookup
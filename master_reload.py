@@ -0,0 +1,178 @@
+import glob
+import logging
+import os
+import shutil
+import threading
+import time
+
+from config import MASTER_REGION_CACHE, MASTER_RETAIN_MINUTES
+from master_cache import read_manifest, read_master_cache
+from master_ingest import discover_batches, refresh_snapshot, snapshot_dir
+from master_partitions import MasterPartitions, save_partitions
+from metrics import inc, timed
+from msn_corrections import MsnCorrections, apply_overlay, overlay_version
+
+logger = logging.getLogger(__name__)
+
+# ----------------- MASTER HOT RELOAD -----------------
+# Background watcher for the master snapshot. When a batch workbook is
+# added or changed (or another process publishes a newer snapshot) it
+# rebuilds the snapshot, loads it and builds every index in its own
+# thread, then swaps the finished bundle in with one assignment. A script
+# run reads `current` once at the top, so sessions keep the version they
+# started with until their next rerun and never wait on a parse.
+#
+# Each poll also folds new MSN corrections from the record store; when the
+# overlay changes, the same snapshot is re-indexed with it applied (no
+# workbook is parsed again).
+#
+# A bundle holds the master as Region partitions (see master_partitions):
+# once they are saved, a swap reads only regions.json, and the snapshot
+# frame is read again only if the bulk upload's lookup is asked for.
+class MasterReloader:
+    def __init__(self, directory=".", cache_dir=None, poll_interval=30.0, corrections=None,
+                 region_cache=MASTER_REGION_CACHE, retain_seconds=MASTER_RETAIN_MINUTES * 60):
+        self.directory = directory
+        self.cache_dir = cache_dir or snapshot_dir()
+        self.poll_interval = poll_interval
+        self.corrections = corrections or MsnCorrections()
+        self.region_cache = region_cache
+        self.retain_seconds = retain_seconds
+        self.current = None
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _build(self, manifest, overlay):
+        with timed("dtr_master_reload_seconds"):
+            def load_frame():
+                return apply_overlay(read_master_cache(self.cache_dir, manifest), overlay)
+
+            # the first process to load a version (and overlay) saves its
+            # partitions beside it; every process then maps the same
+            # read-only pages. Those of older overlays are dropped later,
+            # by drop_superseded().
+            corrected = overlay_version(overlay)
+            version_dir = os.path.join(self.cache_dir, manifest["version"])
+            partitions_dir = os.path.join(
+                version_dir, "partitions" if corrected is None else f"partitions-{corrected}"
+            )
+            if not os.path.isdir(partitions_dir):
+                save_partitions(load_frame(), partitions_dir)
+            else:
+                os.utime(partitions_dir)  # live again: drop_superseded() dates it from now
+            return {
+                "manifest": manifest,
+                "partitions": MasterPartitions(partitions_dir, load_frame, self.region_cache),
+                "overlay": corrected,
+                # (Dtr code, corrected MSN) -> the MSN the master has
+                "corrected": {(dtr_code, new_msn): msn_auto for dtr_code, msn_auto, new_msn in overlay},
+            }
+
+    def drop_superseded(self):
+        # A bundle maps its Regions and search index only when first asked,
+        # so the partitions of an older overlay (and the single index older
+        # releases saved) must outlive the swap: sessions that started
+        # before it, and workers that have not polled since, still read
+        # them. Each is removed once the one that replaced it is older
+        # than retain_seconds.
+        current = self.current
+        if current is None:
+            return
+        keep = current["partitions"].directory
+        version_dir = os.path.dirname(keep)
+        built = sorted(
+            glob.glob(os.path.join(version_dir, "partitions*")) + glob.glob(os.path.join(version_dir, "index*")),
+            key=os.path.getmtime
+        )
+        now = time.time()
+        for old, newer in zip(built, built[1:]):
+            if old != keep and now - os.path.getmtime(newer) > self.retain_seconds:
+                shutil.rmtree(old, ignore_errors=True)
+
+    def _overlay(self, fold=True):
+        if fold:
+            try:
+                folded = self.corrections.sync()
+                if folded:
+                    inc("dtr_msn_corrections_folded_total", folded)
+            except Exception as e:
+                # the corrections already folded still apply
+                logger.warning("Folding MSN corrections failed: %s", e)
+        return self.corrections.overlay()
+
+    def check(self):
+        # One poll: returns True when a new version was swapped in
+        with self._lock:
+            paths = discover_batches(self.directory)
+            manifest = refresh_snapshot(paths, self.cache_dir) if paths else read_manifest(self.cache_dir)
+            if manifest is None:
+                raise FileNotFoundError(f"No master snapshot in {self.cache_dir}")
+            overlay = self._overlay()
+            current = self.current
+            if (current is not None and current["manifest"]["version"] == manifest["version"]
+                    and current["overlay"] == overlay_version(overlay)):
+                self.drop_superseded()
+                return False
+            self.current = self._build(manifest, overlay)
+            inc("dtr_master_reloads_total")
+            logger.info("Master snapshot %s is live (%s records, %s MSN corrections)",
+                        manifest["version"], manifest["rows"], len(overlay))
+            return True
+
+    def load(self):
+        # First load: an existing snapshot is served as it is, even if a
+        # batch has changed since; the watcher republishes it afterwards.
+        # Only a missing snapshot is parsed up front; likewise the MSN
+        # corrections folded so far apply, new ones from the first poll.
+        manifest = read_manifest(self.cache_dir)
+        if manifest is not None:
+            with self._lock:
+                if self.current is None:
+                    self.current = self._build(manifest, self._overlay(fold=False))
+        else:
+            self.check()
+        return self.current
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="master-reload", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+                self.last_error = None
+            except Exception as e:
+                # keep serving the last good version
+                self.last_error = e
+                inc("dtr_master_reload_failures_total")
+                logger.warning("Reloading the master snapshot failed: %s", e)
+            self._stop.wait(self.poll_interval)
+
+
+_reloader = None
+_reloader_lock = threading.Lock()
+
+
+def master_reloader(poll_interval=30.0):
+    # one watcher per process, shared by every page of the portal
+    global _reloader
+    with _reloader_lock:
+        if _reloader is None:
+            reloader = MasterReloader(poll_interval=poll_interval)
+            reloader.load()
+            _reloader = reloader.start()
+    return _reloader
@@ -0,0 +1,35 @@
+import sys
+
+import pandas as pd
+
+from master_cache import compact_frame
+from master_ingest import discover_batches
+
+# ----------------- MASTER MEMORY REPORT -----------------
+# python memory_report.py [workbook.xlsx ...]
+# Compares the resident size of each master workbook loaded the old way
+# (pd.read_excel, one Python string per cell) with its categorical form.
+
+
+def frame_mb(df):
+    return df.memory_usage(deep=True, index=True).sum() / 1e6
+
+
+def memory_report(paths):
+    rows = []
+    for path in paths:
+        plain = pd.read_excel(path, dtype=object)
+        compact = compact_frame(plain)
+        rows.append({
+            "workbook": path,
+            "rows": len(plain),
+            "object_mb": round(frame_mb(plain), 2),
+            "categorical_mb": round(frame_mb(compact), 2),
+            "ratio": round(frame_mb(plain) / frame_mb(compact), 1),
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    report = memory_report(sys.argv[1:] or discover_batches())
+    print(report.to_string(index=False))
@@ -0,0 +1,162 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ----------------- METRICS -----------------
+# A small in-process registry of counters and histograms, rendered in the
+# Prometheus text format on a local HTTP port. Recording is a dict update
+# under one lock, so it is cheap enough for every hot-path call.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+timing_logger = logging.getLogger("dtr.timing")
+
+
+def describe(name, text):
+    _help[name] = text
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+    if timing_logger.isEnabledFor(logging.INFO):
+        timing_logger.info(json.dumps({"ts": time.time(), "metric": name, "seconds": round(seconds, 6), **labels}))
+
+
+@contextmanager
+def timed(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def timed_function(name, **labels):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                      for key, h in _histograms.items()}
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels(labels)} {value}")
+    for name in sorted({name for name, _ in histograms}):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), h in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, h["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {h['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {h['sum']:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+def configure_timing_log(path):
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_logger.addHandler(handler)
+    timing_logger.setLevel(logging.INFO)
+    timing_logger.propagate = False
+
+
+# ----------------- METRIC NAMES -----------------
+describe("dtr_submissions_total", "Form and bulk records committed to the local store")
+describe("dtr_submission_failures_total", "Submit attempts rejected by validation or failed with an error")
+describe("dtr_sheet_sync_rows_total", "Records appended to the Google sheet")
+describe("dtr_sheet_sync_failures_total", "Failed append_rows batches")
+describe("dtr_sheet_sync_retries_total", "Backoff waits before retrying a sync batch")
+describe("dtr_sheets_open_seconds", "Google auth + opening the records sheet")
+describe("dtr_sheets_connects_total", "New sessions opened by the managed sheets client")
+describe("dtr_sheets_token_refreshes_total", "Access tokens refreshed ahead of expiry")
+describe("dtr_sheets_health_check_failures_total", "Idle handles that failed their health check")
+describe("dtr_sheets_call_retries_total", "Sheet reads retried after a transient failure")
+describe("dtr_sheets_get_values_seconds", "Ranged reads of the records sheet")
+describe("dtr_sheets_append_rows_seconds", "append_rows calls to the records sheet")
+describe("dtr_master_load_seconds", "Loading the master snapshot (including rebuilds)")
+describe("dtr_master_publish_seconds", "Parsing and merging the master workbooks")
+describe("dtr_master_reload_seconds", "Loading a new snapshot and building its indexes in the background")
+describe("dtr_master_reloads_total", "Master snapshot versions swapped in")
+describe("dtr_master_reload_failures_total", "Background master reloads that failed")
+describe("dtr_master_partition_load_seconds", "Mapping one Region's partition of the master index")
+describe("dtr_master_partition_loads_total", "Region partitions mapped on first use")
+describe("dtr_master_partition_evictions_total", "Region partitions dropped from the LRU cache")
+describe("dtr_msn_corrections_folded_total", "Officer MSN corrections folded into the master overlay")
+describe("dtr_rerun_seconds", "Streamlit script runs, full page or one section")
+describe("dtr_sessions_expired_total", "Idle sessions whose form state was dropped")
+describe("dtr_api_request_seconds", "JSON API requests, by route")
+describe("dtr_api_batches_total", "Submission batches committed by the JSON API")
+describe("dtr_api_batch_seconds", "Claiming, numbering and storing one API submission batch")
@@ -0,0 +1,199 @@
+import argparse
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+from config import data_path
+from hierarchy import normalize_search_key
+from record_store import RecordStore
+from sheets import RECORD_COLUMNS
+from timing import parse_dates
+
+# ----------------- MSN CORRECTIONS -----------------
+# When an officer answers "नहीं, बदलना है" the record carries the MDM
+# serial (msn_auto) and the one found on site (new_msn). These are folded
+# into a small table keyed by (Dtr code, msn_auto, new_msn), reading only
+# the records stored since the last checkpoint, and turned into an overlay
+# the master reloader applies to the loaded snapshot before building its
+# indexes, so the next officer is offered the corrected serial.
+#
+# A correction is applied only while officers agree: two different new
+# serials for the same (Dtr code, msn_auto) is a conflict, listed for
+# review and left out of the overlay. Corrections of a corrected serial
+# chain (A -> B, then B -> C gives A -> C). The overlay itself is a list
+# of (Dtr code, msn_auto, new_msn), agreed in SQL.
+#
+#   python msn_corrections.py --conflicts conflicts.csv
+CORRECTION_COLUMNS = ["dtr_code", "msn_auto", "new_msn"]
+
+
+class MsnCorrections:
+    def __init__(self, store=None, path=None, chunk_size=5000):
+        self.store = store or RecordStore()
+        self.path = path or data_path("msn_corrections.db")
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS corrections ("
+                " dtr_code TEXT NOT NULL,"
+                " msn_auto TEXT NOT NULL,"
+                " new_msn TEXT NOT NULL,"
+                " records INTEGER NOT NULL,"
+                " first_date TEXT,"
+                " last_date TEXT,"
+                " PRIMARY KEY (dtr_code, msn_auto, new_msn))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoint (id INTEGER PRIMARY KEY CHECK (id = 0), record_id INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO checkpoint (id, record_id) VALUES (0, 0)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def checkpoint(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT record_id FROM checkpoint").fetchone()[0]
+
+    def _fold(self, conn, rows):
+        import pandas as pd
+
+        records = pd.DataFrame(rows, columns=RECORD_COLUMNS)
+        days = parse_dates(records["date"])
+        fixes = pd.DataFrame({
+            "dtr_code": records["dtr_code"].str.strip(),
+            "msn_auto": records["msn_auto"].str.strip(),
+            "new_msn": records["new_msn"].map(normalize_search_key),
+            "day": days.dt.strftime("%Y-%m-%d"),
+        })
+        # a new serial typed where the master had none is an addition, and
+        # retyping the MDM serial changes nothing
+        keep = ((fixes["dtr_code"] != "") & (fixes["msn_auto"] != "") & (fixes["new_msn"] != "")
+                & (fixes["new_msn"] != fixes["msn_auto"].map(normalize_search_key)))
+        fixes = fixes[keep]
+        if fixes.empty:
+            return 0
+        per_key = fixes.groupby(CORRECTION_COLUMNS, sort=False).agg(
+            records=("day", "size"), first_date=("day", "min"), last_date=("day", "max")
+        )
+        conn.executemany(
+            "INSERT INTO corrections VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (dtr_code, msn_auto, new_msn) DO UPDATE SET"
+            " records = records + excluded.records,"
+            " first_date = MIN(COALESCE(first_date, excluded.first_date), COALESCE(excluded.first_date, first_date)),"
+            " last_date = MAX(COALESCE(last_date, excluded.last_date), COALESCE(excluded.last_date, last_date))",
+            [
+                (*key, int(count), None if pd.isna(first) else first, None if pd.isna(last) else last)
+                for key, count, first, last in per_key.itertuples(name=None)
+            ]
+        )
+        return len(fixes)
+
+    def sync(self):
+        # Folds every record stored after the checkpoint, a chunk per
+        # transaction; the checkpoint moves in the same transaction, so
+        # workers syncing side by side never count a record twice.
+        folded = 0
+        with self._lock:
+            while True:
+                conn = self._connect()
+                try:
+                    conn.isolation_level = None
+                    conn.execute("BEGIN IMMEDIATE")
+                    last_id = conn.execute("SELECT record_id FROM checkpoint").fetchone()[0]
+                    batch = self.store.rows_after(last_id, self.chunk_size)
+                    if batch:
+                        folded += self._fold(conn, [row for _, row in batch])
+                        conn.execute("UPDATE checkpoint SET record_id = ?", (batch[-1][0],))
+                    conn.execute("COMMIT")
+                except BaseException:
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    conn.close()
+                if len(batch) < self.chunk_size:
+                    return folded
+
+    def corrections(self):
+        import pandas as pd
+
+        with self._connect() as conn:
+            return pd.read_sql_query(
+                "SELECT * FROM corrections ORDER BY dtr_code, msn_auto, new_msn", conn
+            )
+
+    def overlay(self):
+        # build_overlay()'s overlay, agreed in SQL
+        with self._connect() as conn:
+            agreed = conn.execute(
+                "SELECT dtr_code, msn_auto, MIN(new_msn) FROM corrections"
+                " GROUP BY dtr_code, msn_auto HAVING COUNT(DISTINCT new_msn) = 1"
+                " ORDER BY dtr_code, msn_auto"
+            ).fetchall()
+        return chain_overlay(agreed)
+
+
+def build_overlay(corrections):
+    # -> (overlay: (dtr_code, msn_auto, new_msn) to apply;
+    #     conflicts: the disagreeing corrections, left out)
+    candidates = corrections.groupby(["dtr_code", "msn_auto"])["new_msn"].transform("nunique")
+    conflicts = corrections[candidates > 1].reset_index(drop=True)
+    agreed = corrections[candidates == 1]
+    return chain_overlay(agreed[CORRECTION_COLUMNS].itertuples(index=False, name=None)), conflicts
+
+
+def chain_overlay(agreed):
+    mapping = {(dtr_code, msn_auto): new_msn for dtr_code, msn_auto, new_msn in agreed}
+    overlay = []
+    for (dtr_code, msn_auto), new_msn in mapping.items():
+        seen = {msn_auto}
+        while (dtr_code, new_msn) in mapping and new_msn not in seen:
+            seen.add(new_msn)
+            new_msn = mapping[(dtr_code, new_msn)]
+        if new_msn != msn_auto:  # A -> B -> A is back where it started
+            overlay.append((dtr_code, msn_auto, new_msn))
+    return overlay
+
+
+def overlay_version(overlay):
+    if not overlay:
+        return None
+    text = "".join("\t".join(correction) + "\n" for correction in sorted(overlay))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def apply_overlay(df, overlay):
+    # the master frame with corrected MSNs; other columns stay shared
+    import pandas as pd
+
+    if not overlay:
+        return df
+    overlay = pd.DataFrame(overlay, columns=CORRECTION_COLUMNS)
+    rows = np.flatnonzero(df["Dtr code"].isin(overlay["dtr_code"]).to_numpy())
+    keys = pd.MultiIndex.from_arrays([
+        df["Dtr code"].iloc[rows].astype(str).to_numpy(), df["Msn"].iloc[rows].astype(str).to_numpy()
+    ])
+    corrected = overlay.set_index(["dtr_code", "msn_auto"])["new_msn"].reindex(keys).to_numpy()
+    hit = pd.notna(corrected)
+    msn = df["Msn"].astype(object).to_numpy(copy=True)
+    msn[rows[hit]] = corrected[hit]
+    return df.assign(Msn=pd.Categorical(msn))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new MSN corrections from the record store")
+    parser.add_argument("--conflicts", help="write the conflicting corrections to this CSV")
+    args = parser.parse_args()
+
+    corrections = MsnCorrections()
+    folded = corrections.sync()
+    overlay, conflicts = build_overlay(corrections.corrections())
+    print(f"{folded} new corrections folded (checkpoint: record {corrections.checkpoint()}); "
+          f"{len(overlay)} applied to the master, {conflicts[['dtr_code', 'msn_auto']].drop_duplicates().shape[0]} in conflict")
+    if args.conflicts:
+        conflicts.to_csv(args.conflicts, index=False)
@@ -0,0 +1,81 @@
+import tempfile
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+import streamlit as st
+
+from config import API_PUBLIC_URL, MASTER_POLL_SECONDS
+from master_reload import master_reloader
+from record_export import EXPORT_FORMATS, FILTER_COLUMNS, export_file_name, export_records
+from record_store import RecordStore
+
+# ----------------- PAGE CONFIG -----------------
+st.set_page_config(
+    page_title="DTR Indexation Export",
+    page_icon="📥",
+    layout="centered"
+)
+
+st.markdown("## 📥 रिकॉर्ड निर्यात | Export Records")
+
+@st.cache_resource
+def get_record_store():
+    return RecordStore()
+
+try:
+    partitions = master_reloader(MASTER_POLL_SECONDS).current["partitions"]
+except Exception as e:
+    st.error(f"Error loading master file: {e}")
+    partitions = None
+
+# ----------------- FILTERS -----------------
+# Each level narrows the next; "All" stops the narrowing there.
+ALL = "सभी | All"
+match = {}
+if partitions is not None:
+    path = []
+    labels = ["क्षेत्र | Region", "वृत्त | Circle", "संभाग | Division", "उपकेंद्र | Sub station", "फीडर | Feeder"]
+    for column, label in zip(FILTER_COLUMNS, labels):
+        value = st.selectbox(label, [ALL] + partitions.children(*path), key=f"export_{column}")
+        if value == ALL:
+            break
+        match[column] = value
+        path.append(value)
+
+col1, col2 = st.columns(2)
+with col1:
+    date_from = st.date_input("से | From", value=datetime.today() - timedelta(days=30))
+with col2:
+    date_to = st.date_input("तक | To", value=datetime.today())
+
+fmt = st.radio("फ़ॉर्मेट | Format", list(EXPORT_FORMATS), horizontal=True)
+
+# ----------------- DOWNLOAD -----------------
+# With the JSON API reachable (DTR_API_URL), the download is a link to its
+# /api/export route, which streams the file a chunk at a time. Otherwise
+# the file is built chunk by chunk into a temporary file when the button
+# is clicked, but Streamlit's download button then holds the finished
+# file in server memory until it is fetched, so large exports should go
+# through the API or the record_export.py CLI.
+if API_PUBLIC_URL:
+    params = {**match, "format": fmt, "from": date_from.strftime("%d-%m-%Y"), "to": date_to.strftime("%d-%m-%Y")}
+    st.link_button(
+        "📥 डाउनलोड करें | Download",
+        f"{API_PUBLIC_URL}/api/export?{urlencode(params)}",
+        use_container_width=True
+    )
+else:
+    def build_export():
+        out = tempfile.TemporaryFile()
+        export_records(get_record_store(), fmt, out, match, date_from, date_to)
+        out.seek(0)
+        return out
+
+    st.download_button(
+        "📥 डाउनलोड करें | Download",
+        data=build_export,
+        file_name=export_file_name(fmt, match),
+        mime=EXPORT_FORMATS[fmt],
+        use_container_width=True
+    )
+    st.caption("⚠️ बड़ी फ़ाइलें सर्वर की मेमोरी में बनती हैं | Large exports are held in server memory until downloaded")
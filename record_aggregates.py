@@ -0,0 +1,166 @@
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from config import data_path
+from hierarchy import HIERARCHY_LEVELS
+from sheets import RECORD_COLUMNS, fetch_rows_after
+from timing import outage_durations, parse_dates, parse_times
+
+# ----------------- RECORD AGGREGATES -----------------
+# Running totals over the records sheet for the dashboard: one row per DTR
+# code (records, timed outages, outage minutes) and one per day. Each sync
+# reads only the rows past the last offset and folds them in with UPSERTs,
+# so the cost of a refresh follows the new rows, not the whole sheet.
+RECORD_PATH = ["region", "circle", "division", "substation", "feeder", "dtr"]
+
+
+class RecordAggregates:
+    def __init__(self, path=None, sync_interval=30.0):
+        self.path = path or data_path("record_aggregates.db")
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._last_sync = 0.0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dtr_totals ("
+                " dtr_code TEXT PRIMARY KEY,"
+                " region TEXT, circle TEXT, division TEXT, substation TEXT, feeder TEXT, dtr TEXT,"
+                " records INTEGER NOT NULL,"
+                " timed INTEGER NOT NULL,"
+                " minutes_total REAL NOT NULL,"
+                " minutes_max REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily_totals (day TEXT PRIMARY KEY, records INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sheet_offset (id INTEGER PRIMARY KEY CHECK (id = 0), rows INTEGER NOT NULL)"
+            )
+            conn.execute("INSERT OR IGNORE INTO sheet_offset (id, rows) VALUES (0, 0)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def synced_rows(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT rows FROM sheet_offset").fetchone()[0]
+
+    def _fold(self, conn, rows):
+        records = pd.DataFrame(rows, columns=RECORD_COLUMNS)
+        days = parse_dates(records["date"])
+        # the header row and anything half-filled carry no usable date
+        keep = (records["dtr_code"] != "") & days.notna()
+        records, days = records[keep], days[keep]
+        if records.empty:
+            return 0
+
+        off = parse_times(records["dtr_off_time"])[0]
+        on = parse_times(records["dtr_on_time"])[0]
+        minutes = pd.Series(outage_durations(off, on), index=records.index)
+        records = records.assign(minutes=minutes, timed=minutes.notna())
+
+        per_dtr = records.groupby("dtr_code", sort=False).agg(
+            **{column: (column, "last") for column in RECORD_PATH},
+            records=("dtr_code", "size"),
+            timed=("timed", "sum"),
+            minutes_total=("minutes", "sum"),
+            minutes_max=("minutes", "max"),
+        )
+        conn.executemany(
+            "INSERT INTO dtr_totals VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (dtr_code) DO UPDATE SET"
+            " records = records + excluded.records,"
+            " timed = timed + excluded.timed,"
+            " minutes_total = minutes_total + excluded.minutes_total,"
+            " minutes_max = MAX(COALESCE(minutes_max, 0), COALESCE(excluded.minutes_max, 0))",
+            [
+                (code, *path, int(count), int(timed), float(total),
+                 None if pd.isna(longest) else float(longest))
+                for code, *path, count, timed, total, longest
+                in per_dtr.itertuples(name=None)
+            ]
+        )
+        per_day = days.dt.strftime("%Y-%m-%d").value_counts()
+        conn.executemany(
+            "INSERT INTO daily_totals VALUES (?, ?)"
+            " ON CONFLICT (day) DO UPDATE SET records = records + excluded.records",
+            [(day, int(count)) for day, count in per_day.items()]
+        )
+        return len(records)
+
+    def sync_from_sheet(self, sheet):
+        with self._lock:
+            # a failed read waits out the interval too, not retried per call
+            self._last_sync = time.monotonic()
+            read_from = self.synced_rows()
+            rows = fetch_rows_after(sheet, read_from)
+            conn = self._connect()
+            try:
+                conn.isolation_level = None
+                conn.execute("BEGIN IMMEDIATE")
+                # another worker may have folded some of these rows since the
+                # read: only what lies past the offset it left is new
+                offset = conn.execute("SELECT rows FROM sheet_offset").fetchone()[0]
+                end = read_from + len(rows)
+                rows = rows[max(0, offset - read_from):]
+                if rows:
+                    self._fold(conn, rows)
+                conn.execute("UPDATE sheet_offset SET rows = ?", (max(offset, end),))
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+            return len(rows)
+
+    def sync_if_stale(self, sheet):
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            return self.sync_from_sheet(sheet)
+        return 0
+
+    def dtr_totals(self):
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT * FROM dtr_totals", conn)
+
+    def daily_totals(self):
+        with self._connect() as conn:
+            return pd.read_sql_query("SELECT * FROM daily_totals ORDER BY day", conn)
+
+
+# ----------------- COVERAGE -----------------
+# Indexed DTRs per hierarchy level against the DTRs the master knows.
+# Records are placed by their Dtr code's master path, so a renamed
+# feeder or division still lands under its current name.
+def coverage_report(totals, master_paths, level):
+    levels = HIERARCHY_LEVELS[:HIERARCHY_LEVELS.index(level) + 1]
+    known = master_paths[levels].reset_index()
+    master_counts = known.groupby(levels, observed=True).size().rename("Master DTRs")
+
+    placed = totals.merge(known, left_on="dtr_code", right_on="Dtr code", how="left")
+    for master_column, record_column in zip(HIERARCHY_LEVELS, RECORD_PATH):
+        if master_column in levels:
+            placed[master_column] = placed[master_column].astype(object).fillna(placed[record_column])
+    indexed = placed.groupby(levels).agg(
+        **{
+            "Indexed DTRs": ("dtr_code", "nunique"),
+            "Records": ("records", "sum"),
+            "Timed outages": ("timed", "sum"),
+            "Outage minutes": ("minutes_total", "sum"),
+            "Longest outage (min)": ("minutes_max", "max"),
+        }
+    )
+
+    report = indexed.join(master_counts, how="outer").fillna(
+        {"Indexed DTRs": 0, "Records": 0, "Timed outages": 0, "Outage minutes": 0, "Master DTRs": 0}
+    )
+    report["Coverage %"] = (100 * report["Indexed DTRs"] / report["Master DTRs"].where(report["Master DTRs"] > 0)).round(1)
+    report["Avg outage (min)"] = (report["Outage minutes"] / report["Timed outages"].where(report["Timed outages"] > 0)).round(1)
+    for column in ["Indexed DTRs", "Records", "Timed outages", "Master DTRs"]:
+        report[column] = report[column].astype(int)
+    return report.reset_index()
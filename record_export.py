@@ -0,0 +1,128 @@
+import argparse
+import csv
+import io
+import sys
+import tempfile
+from datetime import datetime
+
+import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from record_store import RecordStore
+from sheets import RECORD_COLUMNS
+
+# ----------------- RECORD EXPORT -----------------
+# Records are read from the local store a chunk at a time and each chunk
+# is written out before the next is read: CSV as it goes, xlsx through
+# openpyxl's write-only mode, Parquet as one row group per chunk. Memory
+# stays at about one chunk whatever the number of records.
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet",
+}
+CHUNK_SIZE = 5000
+# bytes per block when an export is streamed from its spool file
+BLOCK_SIZE = 1 << 20
+# hierarchy levels an export can be narrowed to, as record columns
+FILTER_COLUMNS = ["region", "circle", "division", "substation", "feeder"]
+
+
+def csv_chunks(chunks):
+    # header, then one encoded block per chunk
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RECORD_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def write_xlsx(chunks, out):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Records")
+    ws.append(RECORD_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            ws.append(row)
+    wb.save(out)
+
+
+def write_parquet(chunks, out):
+    schema = pa.schema([(name, pa.string()) for name in RECORD_COLUMNS])
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in chunks:
+            columns = zip(*rows)
+            writer.write_table(pa.table(
+                [pa.array([str(value) for value in column], pa.string()) for column in columns],
+                schema=schema
+            ))
+
+
+def write_export(chunks, fmt, out):
+    # out: a binary file object
+    if fmt == "csv":
+        for block in csv_chunks(chunks):
+            out.write(block)
+    elif fmt == "xlsx":
+        write_xlsx(chunks, out)
+    elif fmt == "parquet":
+        write_parquet(chunks, out)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+
+def export_records(store, fmt, out, match=None, date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    chunks = store.iter_chunks(chunk_size, match, date_from, date_to)
+    write_export(chunks, fmt, out)
+
+
+def export_blocks(store, fmt, match=None, date_from=None, date_to=None, chunk_size=CHUNK_SIZE):
+    # The export as a stream of bytes for an HTTP response. CSV is encoded
+    # chunk by chunk; xlsx and Parquet are zip / footer formats that can
+    # only be read back once complete, so they are spooled to a temporary
+    # file first and streamed from disk.
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    chunks = store.iter_chunks(chunk_size, match, date_from, date_to)
+    if fmt == "csv":
+        yield from csv_chunks(chunks)
+        return
+    with tempfile.TemporaryFile() as out:
+        write_export(chunks, fmt, out)
+        out.seek(0)
+        while block := out.read(BLOCK_SIZE):
+            yield block
+
+
+def export_file_name(fmt, match=None):
+    parts = ["dtr_indexation_records"] + [str(value).replace(" ", "_") for value in (match or {}).values()]
+    return f"{'_'.join(parts)}_{datetime.now():%Y%m%d_%H%M}.{fmt}"
+
+
+def _date(text):
+    return datetime.strptime(text, "%d-%m-%Y").date()
+
+
+if __name__ == "__main__":
+    # python record_export.py --format csv --region Jabalpur --from 01-09-2026 > records.csv
+    parser = argparse.ArgumentParser(description="Export indexation records from the local store")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("--from", dest="date_from", type=_date, help="DD-MM-YYYY, inclusive")
+    parser.add_argument("--to", dest="date_to", type=_date, help="DD-MM-YYYY, inclusive")
+    for column in FILTER_COLUMNS:
+        parser.add_argument(f"--{column}")
+    args = parser.parse_args()
+
+    match = {column: getattr(args, column) for column in FILTER_COLUMNS if getattr(args, column)}
+    if args.output:
+        with open(args.output, "wb") as out:
+            export_records(RecordStore(), args.format, out, match, args.date_from, args.date_to)
+    else:
+        export_records(RecordStore(), args.format, sys.stdout.buffer, match, args.date_from, args.date_to)
@@ -0,0 +1,246 @@
+import json
+import logging
+from contextlib import contextmanager
+import random
+import sqlite3
+import threading
+import time
+
+from config import data_path
+from metrics import inc, timed
+from sheets import RECORD_COLUMNS, is_retryable_error
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process flush lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ----------------- LOCAL RECORD STORE -----------------
+# Every submission is committed to a local SQLite database (WAL mode)
+# before anything else happens; the Google sheet is a replica fed by
+# SheetSync. Each row keeps its sync status, so the form keeps accepting
+# entries at full speed through Google outages or quota exhaustion.
+PENDING = "pending"
+SYNCED = "synced"
+APPLICATION_NUMBER = RECORD_COLUMNS.index("application_number")
+# "DD-MM-YYYY" in the stored row, rearranged to a sortable YYYYMMDD
+_DATE = f"json_extract(row, '$[{RECORD_COLUMNS.index('date')}]')"
+SORTABLE_DATE = f"substr({_DATE}, 7, 4) || substr({_DATE}, 4, 2) || substr({_DATE}, 1, 2)"
+
+
+class RecordStore:
+    def __init__(self, path=None):
+        self.path = path or data_path("records.db")
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " application_number TEXT UNIQUE,"
+                " row TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " sync_status TEXT NOT NULL DEFAULT 'pending',"
+                " synced_at REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " last_error TEXT)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS records_pending ON records (sync_status, id)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def add(self, row):
+        return self.add_many([row])
+
+    def add_many(self, rows):
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO records (application_number, row, created_at) VALUES (?, ?, ?)",
+                [(row[APPLICATION_NUMBER], json.dumps(row, ensure_ascii=False, default=str), now)
+                 for row in rows]
+            )
+        return len(rows)
+
+    def pending(self, limit):
+        with self._connect() as conn:
+            return [
+                (record_id, json.loads(row))
+                for record_id, row in conn.execute(
+                    "SELECT id, row FROM records WHERE sync_status = ? ORDER BY id LIMIT ?",
+                    (PENDING, limit)
+                )
+            ]
+
+    def rows_after(self, last_id, limit=5000):
+        # (id, row) of the records stored after `last_id`, oldest first
+        with self._connect() as conn:
+            return [
+                (record_id, json.loads(row))
+                for record_id, row in conn.execute(
+                    "SELECT id, row FROM records WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, limit)
+                )
+            ]
+
+    def mark_synced(self, ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE records SET sync_status = ?, synced_at = ?, attempts = attempts + 1, last_error = NULL WHERE id = ?",
+                [(SYNCED, time.time(), record_id) for record_id in ids]
+            )
+
+    def mark_failed(self, ids, error):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE records SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(str(error)[:500], record_id) for record_id in ids]
+            )
+
+    def iter_chunks(self, chunk_size=5000, match=None, date_from=None, date_to=None):
+        # Every stored row in submission order, chunk_size at a time, paged
+        # on id so no chunk's query holds more than chunk_size rows.
+        # match: {record column: value}; the date bounds are inclusive.
+        clauses, params = [], []
+        for column, value in (match or {}).items():
+            if column not in RECORD_COLUMNS:
+                raise ValueError(f"Unknown record column: {column}")
+            clauses.append(f"json_extract(row, '$[{RECORD_COLUMNS.index(column)}]') = ?")
+            params.append(value)
+        if date_from is not None:
+            clauses.append(f"{SORTABLE_DATE} >= ?")
+            params.append(date_from.strftime("%Y%m%d"))
+        if date_to is not None:
+            clauses.append(f"{SORTABLE_DATE} <= ?")
+            params.append(date_to.strftime("%Y%m%d"))
+        where = "".join(f" AND {clause}" for clause in clauses)
+
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT id, row FROM records WHERE id > ?{where} ORDER BY id LIMIT ?",
+                    (last_id, *params, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [json.loads(row) for _, row in rows]
+
+
+# ----------------- SHEET SYNC ENGINE -----------------
+# Background worker that pushes pending rows to the sheet with
+# append_rows() in batches, backing off on quota/server errors. Delivery
+# is at-least-once: a crash between the append and mark_synced() resends
+# that batch on restart.
+#
+# With a SubmittedKeyIndex it also catches the index up with rows other
+# processes appended to the sheet, between flushes. That read is the only
+# one the duplicate check depends on, and it never runs on a submit path,
+# so submissions go at full speed while Google is unreachable.
+class SheetSync:
+    def __init__(self, store, open_sheet, submitted_keys=None, batch_size=50, flush_interval=2.0,
+                 min_backoff=2.0, max_backoff=300.0):
+        self.store = store
+        self.open_sheet = open_sheet
+        self.submitted_keys = submitted_keys
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._sheet = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def notify(self):
+        self._wake.set()
+
+    @contextmanager
+    def _flush_lock(self):
+        # Every process sharing the store (portal workers, the API) runs its
+        # own SheetSync; flushes take turns so no batch is appended twice.
+        if fcntl is None:
+            yield
+            return
+        with open(self.store.path + ".sync-lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def flush_once(self):
+        with self._flush_lock():
+            return self._flush()
+
+    def _flush(self):
+        batch = self.store.pending(self.batch_size)
+        if not batch:
+            return 0
+        ids = [record_id for record_id, _ in batch]
+        try:
+            if self._sheet is None:
+                self._sheet = self.open_sheet()
+            with timed("dtr_sheets_append_rows_seconds"):
+                self._sheet.append_rows([row for _, row in batch])
+        except Exception as e:
+            self.store.mark_failed(ids, e)
+            inc("dtr_sheet_sync_failures_total")
+            raise
+        self.store.mark_synced(ids)
+        inc("dtr_sheet_sync_rows_total", len(ids))
+        return len(batch)
+
+    def catch_up(self):
+        if self.submitted_keys is None:
+            return 0
+        if self._sheet is None:
+            self._sheet = self.open_sheet()
+        return self.submitted_keys.sync_if_stale(self._sheet)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="sheet-sync", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        backoff = self.min_backoff
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                flushed = self.flush_once()
+                self.catch_up()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+                if not is_retryable_error(e):
+                    # drop the handle so the next attempt reconnects
+                    self._sheet = None
+                logger.warning("Syncing records to the sheet failed, retrying in %.0fs: %s", backoff, e)
+                inc("dtr_sheet_sync_retries_total")
+                self._stop.wait(backoff + random.uniform(0, backoff / 2))
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            backoff = self.min_backoff
+            if flushed < self.batch_size:
+                # nothing left: sleep until the next notify(), then give
+                # other submitters a moment to land in the same batch
+                self._wake.wait(30)
+                self._stop.wait(self.flush_interval)
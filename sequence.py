@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+from config import data_path
+
+# ----------------- APPLICATION NUMBER ALLOCATOR -----------------
+# Application numbers are "<ddmmyyyy><per-day sequence>". The counter lives
+# in a small SQLite file and is bumped inside an IMMEDIATE transaction, so
+# concurrent submitters (threads or processes on the same host) each get a
+# distinct number at a constant cost, without reading the records sheet.
+
+
+class ApplicationNumberAllocator:
+    def __init__(self, path=None):
+        self.path = path or data_path("sequence.db")
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS app_sequence ("
+                " day TEXT PRIMARY KEY,"
+                " last INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def next_number(self, now=None):
+        return self.next_numbers(1, now)[0]
+
+    def next_numbers(self, count, now=None):
+        # reserves a contiguous block in a single transaction
+        day = (now or datetime.now()).strftime("%d%m%Y")
+        if count <= 0:
+            return []
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.isolation_level = None
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "INSERT INTO app_sequence (day, last) VALUES (?, ?) "
+                    "ON CONFLICT(day) DO UPDATE SET last = last + excluded.last",
+                    (day, count)
+                )
+                last = conn.execute(
+                    "SELECT last FROM app_sequence WHERE day = ?", (day,)
+                ).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        return [f"{day}{seq:04d}" for seq in range(last - count + 1, last + 1)]
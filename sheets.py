@@ -0,0 +1,256 @@
+import json
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from config import SHEETS_BACKEND
+from metrics import inc, timed, timed_function
+
+# ----------------- GOOGLE SHEET ACCESS -----------------
+RECORDS_SPREADSHEET = "DTR_Indexation_Records"
+SCOPE = [
+    "https://spreadsheets.google.com/feeds",
+    "https://www.googleapis.com/auth/drive"
+]
+
+# Column order of a row in DTR_Indexation_Records, as built by the form
+RECORD_COLUMNS = [
+    "region", "circle", "division", "substation", "feeder", "dtr",
+    "dtr_code", "feeder_code", "msn_auto", "new_msn", "final_msn",
+    "dtr_off_time", "dtr_on_time", "date", "ae_je_name", "mobile_number",
+    "application_number", "ct_ratio"
+]
+LAST_RECORD_COLUMN = "R"
+
+
+def _status_code(exc):
+    code = getattr(exc, "code", None)
+    if code is None:
+        response = getattr(exc, "response", None)
+        code = getattr(response, "status_code", None)
+    return code
+
+
+def is_retryable_error(exc):
+    # Quota (429) and server-side (5xx) failures clear up on their own;
+    # anything else is worth a fresh connection before trying again.
+    code = _status_code(exc)
+    return code == 429 or (isinstance(code, int) and code >= 500)
+
+
+def is_connection_error(exc):
+    # dropped sockets, timeouts and failed token refreshes: the handle
+    # itself is suspect, so the next call starts from a new one
+    import requests
+    from google.auth.exceptions import RefreshError, TransportError
+
+    return isinstance(exc, (requests.ConnectionError, requests.Timeout, TransportError, RefreshError)) \
+        or _status_code(exc) == 401
+
+
+# ----------------- MANAGED CLIENT -----------------
+# One long-lived handle per process. The HTTP session keeps a pool of
+# keep-alive connections to the Sheets API, the access token is refreshed
+# a few minutes before it expires instead of on a 401, and a handle that
+# sat idle is health-checked before use. Reads are idempotent and retried
+# with backoff; appends are tried once (a retry could write the rows
+# twice) and left to the caller, after resetting a broken connection.
+class ManagedWorksheet:
+    def __init__(self, creds_dict, pool_size=10, timeout=30, refresh_margin=300,
+                 idle_check=300, read_attempts=3, backoff=1.0):
+        self.creds_dict = dict(creds_dict)
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self.idle_check = idle_check
+        self.read_attempts = read_attempts
+        self.backoff = backoff
+        self._credentials = None
+        self._session = None
+        self._worksheet = None
+        self._last_ok = 0.0
+        self._lock = threading.RLock()
+
+    @timed_function("dtr_sheets_open_seconds")
+    def connect(self):
+        import gspread
+        import requests
+        from google.auth.transport.requests import AuthorizedSession
+        from google.oauth2.service_account import Credentials
+
+        with self._lock:
+            self.close()
+            credentials = Credentials.from_service_account_info(self.creds_dict, scopes=SCOPE)
+            session = AuthorizedSession(credentials)
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size
+            )
+            session.mount("https://", adapter)
+            client = gspread.Client(auth=credentials, session=session)
+            client.set_timeout(self.timeout)
+            self._worksheet = client.open(RECORDS_SPREADSHEET).sheet1
+            self._credentials = credentials
+            self._session = session
+            self._last_ok = time.monotonic()
+            inc("dtr_sheets_connects_total")
+            return self
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._credentials = self._session = self._worksheet = None
+
+    def _token_expiring(self):
+        expiry = self._credentials.expiry  # naive UTC, as google-auth keeps it
+        return not self._credentials.valid or expiry is None \
+            or expiry - datetime.now(timezone.utc).replace(tzinfo=None) < self.refresh_margin
+
+    def _ready(self):
+        with self._lock:
+            if self._worksheet is None:
+                self.connect()
+            elif self._token_expiring():
+                from google.auth.transport.requests import Request
+
+                self._credentials.refresh(Request(self._session))
+                inc("dtr_sheets_token_refreshes_total")
+            if time.monotonic() - self._last_ok > self.idle_check:
+                try:
+                    self._worksheet.spreadsheet.fetch_sheet_metadata()
+                except Exception:
+                    inc("dtr_sheets_health_check_failures_total")
+                    self.connect()
+                self._last_ok = time.monotonic()
+            return self._worksheet
+
+    def _call(self, method, *args, attempts=1, **kwargs):
+        for attempt in range(attempts):
+            try:
+                result = getattr(self._ready(), method)(*args, **kwargs)
+                self._last_ok = time.monotonic()
+                return result
+            except Exception as e:
+                broken = is_connection_error(e)
+                if broken:
+                    self.close()
+                if attempt + 1 == attempts or not (broken or is_retryable_error(e)):
+                    raise
+                inc("dtr_sheets_call_retries_total", call=method)
+                time.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    def get_values(self, *args, **kwargs):
+        return self._call("get_values", *args, attempts=self.read_attempts, **kwargs)
+
+    def get_all_values(self, **kwargs):
+        return self._call("get_all_values", attempts=self.read_attempts, **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        return self._call("append_rows", values, **kwargs)
+
+    def append_row(self, values, **kwargs):
+        return self._call("append_row", values, **kwargs)
+
+
+_managed_sheet = None
+_managed_lock = threading.Lock()
+
+
+def open_records_sheet(creds_dict):
+    # the process-wide managed handle, connected on first use
+    global _managed_sheet
+    with _managed_lock:
+        if _managed_sheet is None:
+            _managed_sheet = ManagedWorksheet(creds_dict)
+    _managed_sheet._ready()
+    return _managed_sheet
+
+
+def fetch_rows_after(sheet, offset):
+    # One ranged read of everything below the first `offset` rows
+    with timed("dtr_sheets_get_values_seconds"):
+        rows = sheet.get_values(f"A{offset + 1}:{LAST_RECORD_COLUMN}")
+    return [row + [""] * (len(RECORD_COLUMNS) - len(row)) for row in rows]
+
+
+# ----------------- LOCAL STAND-IN -----------------
+# Worksheet look-alike for tests, benchmarks and offline runs
+# (DTR_SHEETS_BACKEND=local). Implements the calls the portal makes and can
+# be told to fail the next N calls with a given HTTP status code.
+class LocalSheetError(Exception):
+    def __init__(self, code, message="simulated sheet failure"):
+        super().__init__(f"[{code}]: {message}")
+        self.code = code
+
+
+class LocalWorksheet:
+    def __init__(self, path=None):
+        self.path = path
+        self.rows = []
+        self.calls = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.rows = [json.loads(line) for line in f if line.strip()]
+
+    def fail_next(self, count, code=429):
+        self._failures.extend([code] * count)
+
+    def _call(self):
+        self.calls += 1
+        if self._failures:
+            raise LocalSheetError(self._failures.pop(0))
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        with self._lock:
+            self._call()
+            rows = [[str(value) for value in row] for row in values]
+            self.rows.extend(rows)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for row in rows:
+                        f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def get_all_values(self, **kwargs):
+        with self._lock:
+            self._call()
+            return [list(row) for row in self.rows]
+
+    def get_values(self, range_name=None, **kwargs):
+        # only the "A<n>:<col>" open-ended ranges the portal asks for
+        start = 1
+        if range_name:
+            start = int(range_name.split(":")[0].lstrip("ABCDEFGHIJKLMNOPQRSTUVWXYZ") or 1)
+        with self._lock:
+            self._call()
+            return [list(row) for row in self.rows[start - 1:]]
+
+
+_local_sheet = None
+
+
+def local_records_sheet(path=None):
+    # one shared instance per process, like the cached gspread handle
+    global _local_sheet
+    if _local_sheet is None:
+        _local_sheet = LocalWorksheet(path)
+    return _local_sheet
+
+
+def open_sheet(secrets=None):
+    # The records sheet of the configured backend (DTR_SHEETS_BACKEND). The
+    # service account comes from `secrets`, the portal's st.secrets, read
+    # only when Google is actually opened; processes outside Streamlit
+    # leave it out and the same .streamlit/secrets.toml is loaded here.
+    if SHEETS_BACKEND == "local":
+        return local_records_sheet()
+    if secrets is None:
+        import streamlit as st
+        secrets = st.secrets
+    return open_records_sheet(secrets["gcp_service_account"])
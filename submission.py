@@ -0,0 +1,76 @@
+import csv
+import io
+
+from sheets import RECORD_COLUMNS
+from timing import DATE_FORMAT, MAX_OUTAGE_MINUTES, outage_minutes, parse_time
+
+# ----------------- FORM SUBMISSION -----------------
+# The form's rules and the record it stores, apart from the Streamlit
+# page so they can be imported (and tried) without a session. The bulk
+# upload applies the same rules column-wise.
+#
+# The portal's first render imports this module along with sheets,
+# timing, hierarchy, master_cache, master_ingest and msn_corrections, so
+# none of them imports pandas, openpyxl or the Google client (gspread,
+# google-auth, requests) at the top: those load inside the functions that
+# build frames, read workbooks or connect to the sheet, and a process
+# starting on an existing snapshot gets by with NumPy.
+# benchmarks/bench_startup.py measures what that saves.
+CT_RATIOS = ["(100/5A)", "(200/5A)", "(300/5A)", "(400/5A)", "(500/5A)", "(600/5A)"]
+
+TEMPLATE_COLUMNS = ["Dtr code", "Msn", "CT ratio", "Off time", "On time", "Date", "Officer name", "Mobile number"]
+TEMPLATE_EXAMPLE = ["6546-21", "BS12604917", "(100/5A)", "10:30 AM", "11:15 AM", "17-10-2026", "Officer Name", "9876543210"]
+
+
+def template_csv():
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(TEMPLATE_COLUMNS)
+    writer.writerow(TEMPLATE_EXAMPLE)
+    return out.getvalue().encode("utf-8")
+
+
+def form_errors(ae_je_name, mobile_number, dtr_off_time, dtr_on_time):
+    errors = []
+    if not ae_je_name:
+        errors.append("❌ कृपया अधिकारी का नाम दर्ज करें | Please enter officer name")
+
+    if not mobile_number:
+        errors.append("❌ कृपया मोबाइल नंबर दर्ज करें | Please enter mobile number")
+    elif len(mobile_number) != 10 or not mobile_number.isdigit():
+        errors.append("❌ कृपया वैध 10-अंकीय मोबाइल नंबर दर्ज करें | Please enter valid 10-digit mobile number")
+
+    # on time earlier than off time: the outage ended the next day
+    if outage_minutes(parse_time(dtr_off_time), parse_time(dtr_on_time)) is None:
+        errors.append(f"❌ DTR चालू समय बंद समय के बाद होना चाहिए (अगले दिन: {MAX_OUTAGE_MINUTES // 60} घंटे के भीतर) | DTR on time must be after off time (next day: within {MAX_OUTAGE_MINUTES // 60} hours)")
+    return errors
+
+
+def submission_key(path, msn, timing):
+    # what the duplicate check claims: one DTR meter per date
+    return path["Dtr code"], msn["final_msn"], timing["date"].strftime(DATE_FORMAT)
+
+
+def form_record(path, msn, timing, officer, application_number):
+    # the sections' published values -> a row in RECORD_COLUMNS order
+    record = {
+        "region": path["Region"],
+        "circle": path["Circle"],
+        "division": path["Division"],
+        "substation": path["Sub station"],
+        "feeder": path["Feeder"],
+        "dtr": path["Dtr"],
+        "dtr_code": path["Dtr code"],
+        "feeder_code": path["Feeder code"],
+        "msn_auto": msn["msn_auto"] or "",
+        "new_msn": msn["new_msn"] or "",
+        "final_msn": msn["final_msn"],
+        "dtr_off_time": timing["dtr_off_time"],
+        "dtr_on_time": timing["dtr_on_time"],
+        "date": timing["date"].strftime(DATE_FORMAT),
+        "ae_je_name": officer["ae_je_name"],
+        "mobile_number": officer["mobile_number"],
+        "application_number": application_number,
+        "ct_ratio": msn["ct_ratio"],
+    }
+    return [record[column] for column in RECORD_COLUMNS]
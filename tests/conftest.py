@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# the portal's modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hierarchy import INDEX_COLUMNS  # noqa: E402
+
+# A small master: two Regions, and "Ward 5" as the name of two DTRs on
+# different feeders of one sub station
+MASTER_ROWS = [
+    ["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara", "11KV TOWN", "Ward 5", "6546", "6546-21", "BS12604917"],
+    ["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara", "11KV TOWN", "Ward 5", "6546", "6546-21", "BS12604918"],
+    ["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara", "11KV TOWN", "Station Road", "6546", "6546-22", "BS12604920"],
+    ["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara", "11KV MANDI", "Ward 5", "6547", "6547-03", "BS12604930"],
+    ["Jabalpur", "Seoni", "Seoni", "BAKHARI", "11KV BAKHARI", "Bakhri matamohhla", "5920", "5920-364", "BS12604900"],
+    ["Rewa", "Rewa", "Rewa City", "Rewa", "11KV CITY", "Civil Lines", "7101", "7101-01", "RW00000001"],
+]
+
+
+@pytest.fixture
+def master_frame():
+    return pd.DataFrame(MASTER_ROWS, columns=INDEX_COLUMNS)
@@ -0,0 +1,103 @@
+import datetime
+import io
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from bulk_upload import build_master_lookup, read_upload, submit_records, validate_upload
+from duplicate_index import SubmittedKeyIndex
+from hierarchy import CODE_COLUMNS, HIERARCHY_LEVELS
+from msn_corrections import MsnCorrections
+from record_store import RecordStore
+from sequence import ApplicationNumberAllocator
+from sheets import RECORD_COLUMNS
+from submission import TEMPLATE_COLUMNS
+
+
+@pytest.fixture
+def lookup():
+    master = pd.DataFrame(
+        [["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara", "11KV GADARWARA-(T)-2", "PRATIBHA COLONY",
+          "6546", "6546-21", "BS12604917"]],
+        columns=HIERARCHY_LEVELS + CODE_COLUMNS + ["Msn"]
+    )
+    return build_master_lookup(master)
+
+
+def xlsx(rows):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(TEMPLATE_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    out = io.BytesIO()
+    wb.save(out)
+    return out.getvalue()
+
+
+def upload_row(off, on, date=datetime.date(2026, 10, 17)):
+    return ["6546-21", "BS12604917", "(100/5A)", off, on, date, "Officer Name", "9876543210"]
+
+
+def test_xlsx_time_cells(lookup):
+    data = xlsx([
+        upload_row(datetime.time(10, 30), datetime.time(11, 15, 40)),
+        upload_row(datetime.time(0, 5), datetime.time(12, 0), datetime.date(2026, 10, 18)),
+        # past midnight, on time in the next day
+        upload_row(datetime.time(23, 30), datetime.time(1, 0), datetime.date(2026, 10, 16)),
+        upload_row("10:30 AM", "11:15 AM", "15-10-2026"),
+    ])
+    df = read_upload(data, "upload.xlsx")
+    assert df["Off time"].tolist() == ["10:30 AM", "12:05 AM", "11:30 PM", "10:30 AM"]
+    assert df["On time"].tolist() == ["11:15 AM", "12:00 PM", "01:00 AM", "11:15 AM"]
+
+    records, report = validate_upload(df, lookup)
+    assert report["Errors"].tolist() == ["", "", "", ""]
+    assert records["date"].tolist() == ["17-10-2026", "18-10-2026", "16-10-2026", "15-10-2026"]
+
+
+def test_xlsx_time_cells_keep_the_outage_rules(lookup):
+    data = xlsx([
+        upload_row(datetime.time(10, 30), datetime.time(10, 30)),
+        upload_row(datetime.time(8, 0), datetime.time(7, 0)),
+        upload_row("25:00", datetime.time(7, 0)),
+    ])
+    records, report = validate_upload(read_upload(data, "upload.xlsx"), lookup)
+    assert records.empty
+    assert report["Errors"].str.contains("on time must be after off time").tolist() == [True, True, False]
+    assert "off time must be HH:MM AM/PM" in report["Errors"].iloc[2]
+
+
+def test_unknown_msn_is_not_a_correction(lookup, tmp_path):
+    data = xlsx([["6546-21", "BS99999999", "(100/5A)", "10:30 AM", "11:15 AM", "17-10-2026", "Officer Name", "9876543210"]])
+    records, _ = validate_upload(read_upload(data, "upload.xlsx"), lookup)
+    assert records[["msn_auto", "new_msn", "final_msn"]].values.tolist() == [["", "BS99999999", "BS99999999"]]
+
+    store = RecordStore(str(tmp_path / "records.db"))
+    records = records.assign(application_number="171020260001")
+    store.add_many(records[RECORD_COLUMNS].values.tolist())
+    corrections = MsnCorrections(store, str(tmp_path / "msn_corrections.db"))
+    assert corrections.sync() == 0
+    assert corrections.overlay() == []
+
+
+def test_failed_submission_frees_its_keys(lookup, tmp_path, monkeypatch):
+    data = xlsx([upload_row("10:30 AM", "11:15 AM"), upload_row("10:30 AM", "11:15 AM", "18-10-2026")])
+    records, _ = validate_upload(read_upload(data, "upload.xlsx"), lookup)
+    allocator = ApplicationNumberAllocator(str(tmp_path / "sequence.db"))
+    keys = SubmittedKeyIndex(str(tmp_path / "submitted_keys.db"))
+    store = RecordStore(str(tmp_path / "records.db"))
+
+    def crash(rows):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store, "add_many", crash)
+        with pytest.raises(RuntimeError):
+            submit_records(records, allocator, keys, store)
+
+    # the retry is not turned away as a duplicate
+    submitted, duplicates = submit_records(records, allocator, keys, store)
+    assert len(submitted) == 2
+    assert duplicates.empty
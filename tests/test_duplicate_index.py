@@ -0,0 +1,53 @@
+import threading
+
+from duplicate_index import SubmittedKeyIndex
+
+KEY = ("6546-21", "BS12604917", "17-10-2026")
+
+
+def numbers(keys):
+    with keys._connect() as conn:
+        return conn.execute("SELECT dtr_code, msn, date, application_number FROM submitted_keys").fetchall()
+
+
+def test_one_claim_wins_per_key(tmp_path):
+    # several workers, each with its own index on the same file
+    path = str(tmp_path / "submitted_keys.db")
+    indexes = [SubmittedKeyIndex(path) for _ in range(8)]
+    won = []
+    start = threading.Barrier(len(indexes))
+
+    def claim(keys):
+        start.wait()
+        won.append(keys.claim(*KEY))
+
+    workers = [threading.Thread(target=claim, args=(keys,)) for keys in indexes]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(won) == [False] * 7 + [True]
+
+
+def test_claim_many_and_assign(tmp_path):
+    keys = SubmittedKeyIndex(str(tmp_path / "submitted_keys.db"))
+    assert keys.claim(*KEY)
+    other = ("6546-21", "BS12604917", "18-10-2026")
+    assert keys.claim_many([KEY, other, other]) == [False, True, False]
+
+    keys.assign_many([(*KEY, "171020260001"), (*other, "181020260001")])
+    assert sorted(numbers(keys)) == [(*KEY, "171020260001"), (*other, "181020260001")]
+
+
+def test_release_frees_the_key(tmp_path):
+    keys = SubmittedKeyIndex(str(tmp_path / "submitted_keys.db"))
+    other = ("6547-03", "BS12604930", "17-10-2026")
+    assert keys.claim_many([KEY, other]) == [True, True]
+
+    keys.release(*KEY)
+    assert numbers(keys) == [(*other, None)]
+    assert keys.claim(*KEY)
+
+    keys.release_many([KEY, other])
+    assert numbers(keys) == []
+    assert keys.claim_many([KEY, other]) == [True, True]
@@ -0,0 +1,54 @@
+import pytest
+
+from hierarchy import (
+    build_hierarchy_index, dtr_codes, dtr_msns, hierarchy_children, load_index, save_index, search_master
+)
+
+GADARWARA = ["Jabalpur", "Narsinghpur", "Gadarwara", "Gadarwara"]
+
+
+@pytest.fixture(params=["built", "saved"])
+def index(request, master_frame, tmp_path):
+    # workers read the index saved beside the snapshot, memory-mapped
+    index = build_hierarchy_index(master_frame)
+    if request.param == "saved":
+        save_index(index, str(tmp_path / "index"))
+        index = load_index(str(tmp_path / "index"))
+    return index
+
+
+def test_children_follow_the_master_order(index):
+    assert hierarchy_children(index) == ["Jabalpur", "Rewa"]
+    assert hierarchy_children(index, "Jabalpur") == ["Narsinghpur", "Seoni"]
+    assert hierarchy_children(index, *GADARWARA) == ["11KV TOWN", "11KV MANDI"]
+    assert hierarchy_children(index, *GADARWARA, "11KV TOWN") == ["Ward 5", "Station Road"]
+    assert hierarchy_children(index, "Jabalpur", "Missing") == []
+
+
+def test_same_dtr_name_on_two_feeders_stays_apart(index):
+    assert hierarchy_children(index, *GADARWARA, "11KV MANDI") == ["Ward 5"]
+    assert dtr_codes(index, *GADARWARA, "11KV TOWN", "Ward 5") == ["6546-21"]
+    assert dtr_codes(index, *GADARWARA, "11KV MANDI", "Ward 5") == ["6547-03"]
+    assert dtr_codes(index, *GADARWARA) == ["6546-21", "6546-22", "6547-03"]
+
+
+def test_dtr_msns(index):
+    assert dtr_msns(index, "6546-21") == ["BS12604917", "BS12604918"]
+    assert dtr_msns(index, "6547-03") == ["BS12604930"]
+    assert dtr_msns(index, "0000-00") == []
+
+
+def test_search_master(index):
+    hits = search_master(index, " bs1260491")
+    assert [(hit["field"], hit["value"]) for hit in hits] == [
+        ("Msn", "BS12604917"), ("Msn", "BS12604918")
+    ]
+    assert hits[0]["Feeder"] == "11KV TOWN" and hits[0]["Dtr code"] == "6546-21"
+
+    hits = search_master(index, "6547-03")
+    assert [(hit["field"], hit["Feeder"], hit["Dtr"]) for hit in hits] == [("Dtr code", "11KV MANDI", "Ward 5")]
+    assert "Msn" not in hits[0]
+
+    assert [hit["value"] for hit in search_master(index, "6546", limit=2)] == ["6546", "6546-21"]
+    assert search_master(index, "") == []
+    assert search_master(index, "ZZ") == []
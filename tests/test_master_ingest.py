@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import master_ingest
+from master_ingest import BATCH_ORDER_FILE, discover_batches, refresh_snapshot
+
+
+def batches(directory, names, order=None):
+    for name in names:
+        open(os.path.join(directory, name), "w").close()
+    if order is not None:
+        with open(os.path.join(directory, BATCH_ORDER_FILE), "w", encoding="utf-8") as f:
+            f.write("# oldest first\n" + "\n".join(order) + "\n")
+
+
+def names(paths):
+    return [os.path.basename(path) for path in paths]
+
+
+def test_order_comes_from_the_list(tmp_path):
+    listed = ["DTR Master Information_2.xlsx", "DTR Master Information_10.xlsx", "DTR Master Information_1.xlsx"]
+    batches(tmp_path, listed, order=listed)
+    assert names(discover_batches(tmp_path)) == listed
+
+
+def test_a_lone_batch_needs_no_list(tmp_path):
+    batches(tmp_path, ["DTR Master Information_1.xlsx"])
+    assert names(discover_batches(tmp_path)) == ["DTR Master Information_1.xlsx"]
+    assert discover_batches(tmp_path / "missing") == []
+
+
+@pytest.mark.parametrize("order, error", [
+    (None, ValueError),
+    (["DTR Master Information_1.xlsx"], ValueError),
+    (["DTR Master Information_1.xlsx", "DTR Master Information_1.xlsx", "DTR Master Information_2.xlsx"], ValueError),
+    (["DTR Master Information_1.xlsx", "DTR Master Information_2.xlsx", "DTR Master Information_3.xlsx"],
+     FileNotFoundError),
+])
+def test_ambiguous_order_fails(tmp_path, order, error):
+    batches(tmp_path, ["DTR Master Information_1.xlsx", "DTR Master Information_2.xlsx"], order=order)
+    with pytest.raises(error):
+        discover_batches(tmp_path)
+
+
+def test_workers_publishing_together_parse_once(tmp_path, master_frame, monkeypatch):
+    batches(tmp_path, ["DTR Master Information_1.xlsx"])
+    paths = discover_batches(tmp_path)
+    parsed = []
+
+    def merge_batches(paths, workers=None):
+        parsed.append(paths)
+        time.sleep(0.2)
+        return master_frame, pd.DataFrame()
+
+    monkeypatch.setattr(master_ingest, "merge_batches", merge_batches)
+    versions = []
+    workers = [
+        threading.Thread(target=lambda: versions.append(refresh_snapshot(paths, str(tmp_path / "cache"))["version"]))
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(parsed) == 1
+    assert len(versions) == 2 and versions[0] == versions[1]
+
+
+def test_a_spawned_worker_does_not_wait_on_its_parents_lock(tmp_path, monkeypatch):
+    batches(tmp_path, ["DTR Master Information_1.xlsx"])
+    # what a merge worker sees while re-importing the parent's main module
+    monkeypatch.setattr(master_ingest.multiprocessing.current_process(), "_inheriting", True, raising=False)
+    with pytest.raises(RuntimeError):
+        refresh_snapshot(discover_batches(tmp_path), str(tmp_path / "cache"))
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from hierarchy import dtr_msns, search_master
+from master_cache import write_columns
+from master_reload import MasterReloader
+from msn_corrections import MsnCorrections
+from record_store import RecordStore
+from sheets import RECORD_COLUMNS
+
+
+def correction_row(number, dtr_code, msn_auto, new_msn):
+    row = dict.fromkeys(RECORD_COLUMNS, "")
+    row.update(dtr_code=dtr_code, msn_auto=msn_auto, new_msn=new_msn, final_msn=new_msn,
+               date="17-10-2026", application_number=str(number))
+    return [row[column] for column in RECORD_COLUMNS]
+
+
+@pytest.fixture
+def reloader(tmp_path, master_frame):
+    cache_dir = str(tmp_path / "master_snapshot")
+    write_columns(master_frame, cache_dir, [{"name": "master.xlsx", "size": 1, "mtime": 0, "sha256": "0"}])
+    store = RecordStore(str(tmp_path / "records.db"))
+    corrections = MsnCorrections(store, str(tmp_path / "msn_corrections.db"))
+    # no batches in tmp_path: the snapshot above is served as it is
+    reloader = MasterReloader(directory=str(tmp_path), cache_dir=cache_dir, corrections=corrections)
+    reloader.load()
+    return reloader
+
+
+def test_old_bundle_still_works_after_an_overlay_rebuild(reloader):
+    old = reloader.current["partitions"]
+    reloader.corrections.store.add(correction_row(1, "6546-21", "BS12604917", "BS99990001"))
+
+    assert reloader.check()
+    new = reloader.current["partitions"]
+    assert new.directory != old.directory
+    assert reloader.check() is False  # a later poll with nothing new
+
+    # nothing was mapped by the old bundle before the swap
+    assert old.children("Jabalpur") == ["Narsinghpur", "Seoni"]
+    assert dtr_msns(old.region("Jabalpur"), "6546-21") == ["BS12604917", "BS12604918"]
+    assert dtr_msns(new.region("Jabalpur"), "6546-21") == ["BS99990001", "BS12604918"]
+    assert search_master(old.search_index(), "BS12604917")[0]["Dtr code"] == "6546-21"
+
+
+def test_superseded_partitions_go_after_the_retention(reloader):
+    old = reloader.current["partitions"].directory
+    reloader.corrections.store.add(correction_row(1, "6546-21", "BS12604917", "BS99990001"))
+    reloader.check()
+    assert os.path.isdir(old)
+
+    reloader.retain_seconds = 0
+    reloader.check()
+    assert not os.path.isdir(old)
+    assert os.path.isdir(reloader.current["partitions"].directory)
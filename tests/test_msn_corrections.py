@@ -0,0 +1,75 @@
+import pytest
+
+from msn_corrections import MsnCorrections, apply_overlay, build_overlay, chain_overlay
+from record_store import RecordStore
+from sheets import RECORD_COLUMNS
+
+
+def correction_row(number, msn_auto, new_msn, dtr_code="6546-21", date="17-10-2026"):
+    row = dict.fromkeys(RECORD_COLUMNS, "")
+    row.update(dtr_code=dtr_code, msn_auto=msn_auto, new_msn=new_msn, final_msn=new_msn,
+               date=date, application_number=str(number))
+    return [row[column] for column in RECORD_COLUMNS]
+
+
+@pytest.fixture
+def corrections(tmp_path):
+    store = RecordStore(str(tmp_path / "records.db"))
+    return MsnCorrections(store, str(tmp_path / "msn_corrections.db"), chunk_size=2)
+
+
+def test_corrections_of_a_corrected_serial_chain(corrections):
+    corrections.store.add_many([
+        correction_row(1, "BS12604917", "BS00000002"),
+        correction_row(2, "BS00000002", "BS00000003"),
+    ])
+    assert corrections.sync() == 2
+    assert corrections.overlay() == [
+        ("6546-21", "BS00000002", "BS00000003"),
+        ("6546-21", "BS12604917", "BS00000003"),
+    ]
+
+
+def test_a_cycle_ends_where_it_started():
+    assert chain_overlay([("6546-21", "A", "B"), ("6546-21", "B", "A")]) == []
+    assert chain_overlay([("6546-21", "A", "B"), ("6546-21", "B", "A"), ("6546-22", "A", "B")]) == [
+        ("6546-22", "A", "B")
+    ]
+
+
+def test_officers_who_disagree_are_left_out(corrections):
+    corrections.store.add_many([
+        correction_row(1, "BS12604917", "BS00000002"),
+        correction_row(2, "BS12604917", "BS00000003", date="18-10-2026"),
+        correction_row(3, "BS12604920", "BS00000004", dtr_code="6546-22"),
+    ])
+    corrections.sync()
+    assert corrections.overlay() == [("6546-22", "BS12604920", "BS00000004")]
+
+    overlay, conflicts = build_overlay(corrections.corrections())
+    assert overlay == [("6546-22", "BS12604920", "BS00000004")]
+    assert conflicts[["msn_auto", "new_msn", "records"]].values.tolist() == [
+        ["BS12604917", "BS00000002", 1], ["BS12604917", "BS00000003", 1]
+    ]
+
+
+def test_apply_overlay(master_frame):
+    overlay = [("6546-21", "BS12604917", "BS00000002"), ("6547-03", "BS99999999", "BS00000005")]
+    corrected = apply_overlay(master_frame, overlay)
+    assert corrected["Msn"].astype(str).tolist() == [
+        "BS00000002", "BS12604918", "BS12604920", "BS12604930", "BS12604900", "RW00000001"
+    ]
+    assert corrected["Dtr"].tolist() == master_frame["Dtr"].tolist()
+    assert apply_overlay(master_frame, []) is master_frame
+
+
+def test_sync_folds_each_record_once(corrections):
+    corrections.store.add_many([correction_row(n, "BS12604917", "BS00000002") for n in range(1, 6)])
+    assert corrections.sync() == 5
+    assert corrections.checkpoint() == 5
+    assert corrections.sync() == 0
+
+    corrections.store.add(correction_row(6, "BS12604917", "BS00000002", date="19-10-2026"))
+    assert corrections.sync() == 1
+    table = corrections.corrections()
+    assert table[["records", "first_date", "last_date"]].values.tolist() == [[6, "2026-10-17", "2026-10-19"]]
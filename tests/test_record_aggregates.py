@@ -0,0 +1,51 @@
+import pytest
+
+import record_aggregates
+from record_aggregates import RecordAggregates
+from sheets import RECORD_COLUMNS, LocalSheetError, LocalWorksheet, fetch_rows_after
+
+
+def make_row(number, dtr_code="6546-21", date="17-10-2026"):
+    row = dict.fromkeys(RECORD_COLUMNS, "")
+    row.update(dtr_code=dtr_code, final_msn="BS12604917", date=date, application_number=str(number),
+               dtr_off_time="10:30 AM", dtr_on_time="11:15 AM")
+    return [row[column] for column in RECORD_COLUMNS]
+
+
+@pytest.fixture
+def sheet():
+    sheet = LocalWorksheet()
+    sheet.append_rows([make_row(n) for n in range(1, 11)])
+    return sheet
+
+
+def test_workers_syncing_side_by_side_count_each_row_once(sheet, tmp_path, monkeypatch):
+    path = str(tmp_path / "record_aggregates.db")
+    first, second = RecordAggregates(path), RecordAggregates(path)
+
+    def fetch_while_the_other_syncs(sheet, offset):
+        # the other worker folds the same rows between this read and its fold
+        rows = fetch_rows_after(sheet, offset)
+        monkeypatch.setattr(record_aggregates, "fetch_rows_after", fetch_rows_after)
+        second.sync_from_sheet(sheet)
+        return rows
+
+    monkeypatch.setattr(record_aggregates, "fetch_rows_after", fetch_while_the_other_syncs)
+    assert first.sync_from_sheet(sheet) == 0
+    assert first.dtr_totals()["records"].tolist() == [10]
+    assert first.synced_rows() == 10
+
+    sheet.append_rows([make_row(11)])
+    assert second.sync_from_sheet(sheet) == 1
+    assert first.dtr_totals()[["records", "timed", "minutes_total"]].values.tolist() == [[11, 11, 495.0]]
+
+
+def test_failed_sync_waits_out_the_interval(sheet, tmp_path):
+    aggregates = RecordAggregates(str(tmp_path / "record_aggregates.db"), sync_interval=60)
+    sheet.fail_next(1, code=503)
+
+    with pytest.raises(LocalSheetError):
+        aggregates.sync_if_stale(sheet)
+    calls = sheet.calls
+    assert aggregates.sync_if_stale(sheet) == 0
+    assert sheet.calls == calls
@@ -0,0 +1,143 @@
+import time
+
+import pytest
+
+from duplicate_index import SubmittedKeyIndex
+from record_store import PENDING, SYNCED, RecordStore, SheetSync
+from sheets import RECORD_COLUMNS, LocalSheetError, LocalWorksheet
+
+
+def make_row(number, dtr_code="6546-21", msn="BS12604917", date="17-10-2026"):
+    row = dict.fromkeys(RECORD_COLUMNS, "")
+    row.update(dtr_code=dtr_code, final_msn=msn, date=date, application_number=str(number))
+    return [row[column] for column in RECORD_COLUMNS]
+
+
+def statuses(store):
+    with store._connect() as conn:
+        return conn.execute("SELECT sync_status, attempts, last_error FROM records ORDER BY id").fetchall()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RecordStore(str(tmp_path / "records.db"))
+
+
+@pytest.fixture
+def sheet():
+    return LocalWorksheet()
+
+
+def test_failed_flush_keeps_rows_pending(store, sheet):
+    store.add_many([make_row(1), make_row(2)])
+    sheet.fail_next(1, code=429)
+    sync = SheetSync(store, open_sheet=lambda: sheet)
+
+    with pytest.raises(LocalSheetError):
+        sync.flush_once()
+    assert sheet.rows == []
+    assert [(status, attempts) for status, attempts, _ in statuses(store)] == [(PENDING, 1), (PENDING, 1)]
+    assert all("429" in error for _, _, error in statuses(store))
+
+    assert sync.flush_once() == 2
+    assert statuses(store) == [(SYNCED, 2, None), (SYNCED, 2, None)]
+    assert [row[RECORD_COLUMNS.index("application_number")] for row in sheet.rows] == ["1", "2"]
+
+
+def test_background_sync_retries_with_backoff(store, sheet):
+    opened = []
+
+    def open_sheet():
+        opened.append(sheet)
+        return sheet
+
+    store.add_many([make_row(n) for n in range(1, 4)])
+    # two quota errors keep the handle, the server error after them too
+    sheet.fail_next(2, code=429)
+    sheet.fail_next(1, code=503)
+    sync = SheetSync(store, open_sheet=open_sheet, min_backoff=0.01, max_backoff=0.04, flush_interval=0.01)
+    sync.start()
+    try:
+        assert wait_for(lambda: len(sheet.rows) == 3)
+        assert wait_for(lambda: sync.last_error is None)
+    finally:
+        sync.stop(timeout=5)
+    assert sheet.calls == 4
+    assert len(opened) == 1
+    assert [status for status, _, _ in statuses(store)] == [SYNCED] * 3
+
+
+def test_non_retryable_error_reconnects(store, sheet):
+    opened = []
+
+    def open_sheet():
+        opened.append(sheet)
+        return sheet
+
+    store.add(make_row(1))
+    sheet.fail_next(1, code=400)
+    sync = SheetSync(store, open_sheet=open_sheet, min_backoff=0.01, max_backoff=0.02, flush_interval=0.01)
+    sync.start()
+    try:
+        assert wait_for(lambda: len(sheet.rows) == 1)
+    finally:
+        sync.stop(timeout=5)
+    assert len(opened) == 2
+
+
+def test_delivery_is_at_least_once(store, sheet, monkeypatch):
+    # a crash between append_rows() and mark_synced() resends the batch
+    store.add_many([make_row(1), make_row(2)])
+    sync = SheetSync(store, open_sheet=lambda: sheet)
+
+    def crash(ids):
+        raise RuntimeError("killed before mark_synced")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(store, "mark_synced", crash)
+        with pytest.raises(RuntimeError):
+            sync.flush_once()
+    assert len(sheet.rows) == 2
+    assert [status for status, _, _ in statuses(store)] == [PENDING, PENDING]
+
+    assert sync.flush_once() == 2
+    assert len(sheet.rows) == 4
+    assert [status for status, _, _ in statuses(store)] == [SYNCED, SYNCED]
+
+
+def test_catch_up_indexes_rows_from_the_sheet(store, sheet, tmp_path):
+    keys = SubmittedKeyIndex(str(tmp_path / "submitted_keys.db"), sync_interval=60)
+    # appended by another process, never seen by this store
+    sheet.append_rows([make_row(7, msn="BS00000001")])
+    sync = SheetSync(store, open_sheet=lambda: sheet, submitted_keys=keys)
+
+    assert sync.catch_up() == 1
+    assert not keys.claim("6546-21", "BS00000001", "17-10-2026")
+    assert keys.claim("6546-21", "BS00000002", "17-10-2026")
+
+    # within the interval nothing is read again
+    calls = sheet.calls
+    sheet.append_rows([make_row(8, msn="BS00000003")])
+    assert sync.catch_up() == 0
+    assert sheet.calls == calls + 1
+
+
+def test_failed_catch_up_waits_out_the_interval(store, sheet, tmp_path):
+    keys = SubmittedKeyIndex(str(tmp_path / "submitted_keys.db"), sync_interval=60)
+    sync = SheetSync(store, open_sheet=lambda: sheet, submitted_keys=keys)
+    sheet.fail_next(1, code=503)
+
+    with pytest.raises(LocalSheetError):
+        sync.catch_up()
+    calls = sheet.calls
+    assert sync.catch_up() == 0
+    assert sheet.calls == calls
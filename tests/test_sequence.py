@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from sequence import ApplicationNumberAllocator
+
+DAY = datetime(2026, 10, 17)
+
+
+def test_numbers_are_unique_across_allocators(tmp_path):
+    # one allocator per worker, all on the same file
+    path = str(tmp_path / "sequence.db")
+    allocators = [ApplicationNumberAllocator(path) for _ in range(4)]
+    numbers = []
+
+    def allocate(allocator):
+        for count in (1, 3, 1, 5) * 5:
+            numbers.extend(allocator.next_numbers(count, DAY))
+
+    workers = [threading.Thread(target=allocate, args=(allocator,)) for allocator in allocators]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(numbers) == 4 * 50
+    assert sorted(numbers) == [f"17102026{seq:04d}" for seq in range(1, 201)]
+
+
+def test_each_day_counts_from_one(tmp_path):
+    allocator = ApplicationNumberAllocator(str(tmp_path / "sequence.db"))
+    assert allocator.next_numbers(2, DAY) == ["171020260001", "171020260002"]
+    assert allocator.next_number(datetime(2026, 10, 18)) == "181020260001"
+    assert allocator.next_numbers(0, DAY) == []
+    assert allocator.next_number(DAY) == "171020260003"
+
+
+def test_a_locked_database_is_reported(tmp_path, monkeypatch):
+    path = str(tmp_path / "sequence.db")
+    allocator = ApplicationNumberAllocator(path)
+    monkeypatch.setattr(allocator, "_connect", lambda: sqlite3.connect(path, timeout=0.05))
+    writer = sqlite3.connect(path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            allocator.next_number(DAY)
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert allocator.next_number(DAY) == "171020260001"
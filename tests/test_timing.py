@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+import pytest
+
+from timing import MAX_OUTAGE_MINUTES, outage_durations, outage_minutes, parse_time, parse_times
+
+TIMES = [
+    # the stored form, and the 12 AM / 12 PM edges
+    ("12:00 AM", 0), ("12:59 AM", 59), ("01:00 AM", 60), ("11:59 AM", 719),
+    ("12:00 PM", 720), ("12:30 pm", 750), ("01:00 PM", 780), ("11:59 PM", 1439),
+    # what officers type and the bulk sheets carry
+    ("10:30AM", 630), ("10:30 am ", 630), (" 9:05 pm", 1265), ("9:05PM", 1265), ("10:30  Am", 630),
+    # not a time
+    ("00:30 AM", None), ("13:00 PM", None), ("10:60 AM", None), ("10:5 AM", None),
+    ("10:30", None), ("10 :30 AM", None), ("10:30 XM", None), ("१०:३० AM", None),
+    ("", None), ("AM", None), ("123:00 AM", None),
+]
+
+
+@pytest.mark.parametrize("text, minutes", TIMES)
+def test_scalar_and_vectorized_parse_agree(text, minutes):
+    assert parse_time(text) == minutes
+    vectorized = parse_times([text])[0].iloc[0]
+    assert (None if math.isnan(vectorized) else vectorized) == minutes
+
+
+def test_vectorized_parse_of_a_mixed_column():
+    texts = [text for text, _ in TIMES]
+    parsed = parse_times(texts)[0]
+    assert [None if math.isnan(value) else value for value in parsed] == [parse_time(text) for text in texts]
+
+
+OUTAGES = [
+    ("10:30 AM", "11:15 AM", 45),
+    ("11:30 PM", "12:30 AM", 60),  # past midnight
+    ("12:00 PM", "12:00 AM", 720),
+    ("08:00 PM", "08:00 AM", MAX_OUTAGE_MINUTES),  # at the limit
+    ("07:59 PM", "08:00 AM", None),  # one minute over
+    ("01:00 AM", "11:00 PM", 1320),  # same day: no limit
+    ("10:30 AM", "10:30 AM", None),  # zero length
+    ("12:00 AM", "12:00 AM", None),
+    ("10:30 AM", "bad", None),
+]
+
+
+@pytest.mark.parametrize("off, on, minutes", OUTAGES)
+def test_scalar_and_vectorized_outages_agree(off, on, minutes):
+    assert outage_minutes(parse_time(off), parse_time(on)) == minutes
+    duration = outage_durations(parse_times([off])[0], parse_times([on])[0])[0]
+    assert (None if np.isnan(duration) else duration) == minutes
@@ -0,0 +1,202 @@
+import re
+import sys
+
+import numpy as np
+
+from sheets import RECORD_COLUMNS
+
+# ----------------- OUTAGE TIMING -----------------
+# One place for the "HH:MM AM/PM" off/on times the form and the bulk
+# upload store. Scalar helpers serve the form; the vectorized ones parse
+# whole record sets. An on time earlier than the off time is an outage
+# that ran past midnight, accepted as long as it stays under
+# MAX_OUTAGE_MINUTES (anything longer is far more likely a typo).
+#
+# A valid time is TIME_PATTERN with valid_clock() on its hour and minute,
+# for parse_time() and parse_times() alike ("10:30AM", " 9:05 pm " and
+# "12:00 am" all pass both; "13:00 PM", "10:5 AM" and "10:30" neither).
+TIME_PATTERN = r"^\s*([0-9]{1,2}):([0-9]{2})\s*([AaPp][Mm])\s*$"
+_TIME = re.compile(TIME_PATTERN)
+# xlsx time cells read as text: "HH:MM:SS" on the 24-hour clock, with the
+# date in front when the cell holds a full datetime
+CLOCK_PATTERN = r"^\s*(?:[0-9]{4}-[0-9]{2}-[0-9]{2}\s+)?([0-9]{1,2}):([0-9]{2})(?::[0-9]{2}(?:\.[0-9]+)?)?\s*$"
+DATE_FORMAT = "%d-%m-%Y"
+DAY_MINUTES = 24 * 60
+MAX_OUTAGE_MINUTES = 12 * 60
+
+
+def to_minutes(hour, minute, ampm):
+    # minutes since midnight; 12 AM is 00:xx and 12 PM is 12:xx
+    hour = int(hour) % 12
+    if str(ampm).upper() == "PM":
+        hour += 12
+    return hour * 60 + int(minute)
+
+
+def valid_clock(hour, minute):
+    # works on numbers and element-wise on arrays/Series (NaN fails)
+    return (hour >= 1) & (hour <= 12) & (minute >= 0) & (minute <= 59)
+
+
+def parse_time(text):
+    match = _TIME.match(str(text))
+    if match is None:
+        return None
+    hour, minute, ampm = match.groups()
+    if not valid_clock(int(hour), int(minute)):
+        return None
+    return to_minutes(hour, minute, ampm)
+
+
+def outage_minutes(off, on):
+    # None for a zero-length or over-long outage
+    if off is None or on is None:
+        return None
+    minutes = (on - off) % DAY_MINUTES
+    if minutes == 0 or (on < off and minutes > MAX_OUTAGE_MINUTES):
+        return None
+    return minutes
+
+
+def _parse_fixed(values):
+    # The stored form "HH:MM AM" is 8 characters wide: compare code points
+    # column by column instead of running a regex per row.
+    chars = np.asarray(values, dtype="<U8").view(np.uint32).reshape(-1, 8)
+    digits = chars[:, [0, 1, 3, 4]].astype(np.int64) - ord("0")
+    upper = chars & ~np.uint32(0x20)
+    ok = (
+        ((digits >= 0) & (digits <= 9)).all(axis=1)
+        & (chars[:, 2] == ord(":")) & (chars[:, 5] == ord(" "))
+        & np.isin(upper[:, 6], [ord("A"), ord("P")]) & (upper[:, 7] == ord("M"))
+    )
+    hour = digits[:, 0] * 10 + digits[:, 1]
+    minute = digits[:, 2] * 10 + digits[:, 3]
+    ok &= valid_clock(hour, minute)
+    ampm = np.where(upper[:, 6] == ord("P"), "PM", "AM")
+    return ok, hour, minute, ampm
+
+
+def parse_times(values):
+    # "HH:MM AM/PM" -> minutes since midnight (NaN where unparseable),
+    # plus the hour, minute and AM/PM parts
+    import pandas as pd
+
+    values = pd.Series(values, dtype=object).fillna("").astype(str)
+    hour = pd.Series(np.nan, index=values.index)
+    minute = pd.Series(np.nan, index=values.index)
+    ampm = pd.Series(np.nan, index=values.index, dtype=object)
+
+    fixed = (values.str.len() == 8).to_numpy().copy()
+    if fixed.any():
+        ok, fixed_hour, fixed_minute, fixed_ampm = _parse_fixed(values[fixed].to_numpy())
+        rows = values.index[fixed][ok]
+        hour.loc[rows], minute.loc[rows], ampm.loc[rows] = fixed_hour[ok], fixed_minute[ok], fixed_ampm[ok]
+        fixed[np.flatnonzero(fixed)[~ok]] = False
+
+    # everything else ("9:30 am", extra spaces, ...) takes the regex path
+    rest = values[~fixed]
+    if len(rest):
+        parts = rest.str.extract(TIME_PATTERN)
+        hour.loc[rest.index] = pd.to_numeric(parts[0], errors="coerce")
+        minute.loc[rest.index] = pd.to_numeric(parts[1], errors="coerce")
+        ampm.loc[rest.index] = parts[2].str.upper()
+
+    valid = valid_clock(hour, minute)
+    hour24 = (hour % 12) + np.where(ampm == "PM", 12, 0)
+    return (hour24 * 60 + minute).where(valid), hour, minute, ampm
+
+
+def format_times(hour, minute, ampm):
+    return (hour.fillna(0).astype(int).map("{:02d}".format) + ":"
+            + minute.fillna(0).astype(int).map("{:02d}".format) + " " + ampm.fillna(""))
+
+
+def clock_times(values):
+    # 24-hour "HH:MM[:SS]" -> "HH:MM AM/PM" (seconds dropped); anything
+    # else is left as it is for parse_times() to judge
+    import pandas as pd
+
+    values = pd.Series(values, dtype=object).fillna("").astype(str)
+    parts = values.str.extract(CLOCK_PATTERN)
+    hour = pd.to_numeric(parts[0], errors="coerce")
+    minute = pd.to_numeric(parts[1], errors="coerce")
+    clock = hour.between(0, 23) & minute.between(0, 59)
+    ampm = pd.Series(np.where(hour >= 12, "PM", "AM"), index=values.index)
+    converted = format_times((hour - 1) % 12 + 1, minute, ampm)
+    return values.where(~clock, converted)
+
+
+def parse_dates(values):
+    import pandas as pd
+
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+    # xlsx date cells arrive as "YYYY-MM-DD 00:00:00"
+    fallback = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    return parsed.fillna(fallback)
+
+
+def outage_durations(off, on):
+    # vectorized outage_minutes(): NaN where either side is missing, the
+    # outage has no length, or a midnight crossing runs past the limit
+    off = np.asarray(off, dtype=float)
+    on = np.asarray(on, dtype=float)
+    minutes = np.mod(on - off, DAY_MINUTES)
+    bad = (minutes == 0) | ((on < off) & (minutes > MAX_OUTAGE_MINUTES))
+    return np.where(bad, np.nan, minutes)
+
+
+# ----------------- ANOMALIES -----------------
+# Over a whole record set: outages that cannot be timed, outages longer
+# than the limit, and outages of one DTR that overlap each other.
+def outage_table(records, max_minutes=MAX_OUTAGE_MINUTES):
+    import pandas as pd
+
+    off = parse_times(records["dtr_off_time"])[0].to_numpy()
+    on = parse_times(records["dtr_on_time"])[0].to_numpy()
+    days = parse_dates(records["date"])
+
+    # raw span, so an over-long one is still placed on the timeline
+    span = np.mod(on - off, DAY_MINUTES)
+    start = days + pd.to_timedelta(off, unit="min")
+    end = start + pd.to_timedelta(span, unit="min")
+
+    table = pd.DataFrame({
+        "dtr_code": records["dtr_code"].to_numpy(),
+        "start": start.to_numpy(),
+        "end": end.to_numpy(),
+        "minutes": span,
+        "crosses_midnight": on < off,
+    }, index=records.index)
+    table["untimed"] = table["start"].isna() | table["end"].isna() | (span == 0)
+    table["too_long"] = ~table["untimed"] & (span > max_minutes)
+
+    # sorted per DTR by start, an outage overlaps when it begins before
+    # the latest end seen so far for that DTR, or ends after the next start
+    timed = table[~table["untimed"]].sort_values(["dtr_code", "start"])
+    by_dtr = timed.groupby("dtr_code", sort=False)
+    previous_end = by_dtr["end"].cummax().groupby(timed["dtr_code"], sort=False).shift()
+    next_start = by_dtr["start"].shift(-1)
+    overlaps = (timed["start"] < previous_end) | (timed["end"] > next_start)
+    table["overlaps"] = overlaps.reindex(table.index, fill_value=False)
+    table["minutes"] = table["minutes"].where(~table["untimed"])
+    return table
+
+
+def anomaly_summary(table):
+    return {
+        "records": int(len(table)),
+        "untimed": int(table["untimed"].sum()),
+        "crosses_midnight": int((table["crosses_midnight"] & ~table["untimed"]).sum()),
+        "too_long": int(table["too_long"].sum()),
+        "overlaps": int(table["overlaps"].sum()),
+    }
+
+
+if __name__ == "__main__":
+    # python timing.py records.csv  (a download of the records sheet)
+    import pandas as pd
+
+    for path in sys.argv[1:]:
+        records = pd.read_csv(path, dtype=str, keep_default_na=False)
+        records.columns = RECORD_COLUMNS[:len(records.columns)]
+        print(path, anomaly_summary(outage_table(records)))